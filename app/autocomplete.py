@@ -0,0 +1,223 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+
+from .models import Book, Genre, User
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Сколько совпадений просматриваем, прежде чем отбирать лучшие
+SCAN_FACTOR = 10
+
+
+def normalize(text):
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def prefix_keys(label):
+    # Полная строка и каждый её хвост, начинающийся с нового слова
+    words = normalize(label).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+# --- Префиксный индекс: отсортированный массив ключей + бинарный поиск ---
+class PrefixIndex:
+    def __init__(self):
+        self._keys = []
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def load(self, items):
+        keys = []
+        entries = {}
+        for kind, obj_id, label, weight in items:
+            entries[(kind, obj_id)] = (label, weight, normalize(label))
+            keys.extend((key, kind, obj_id) for key in prefix_keys(label))
+        keys.sort()
+
+        with self._lock:
+            self._keys = keys
+            self._items = entries
+
+    # Правки меняют только ключи одной записи: вставка и удаление через bisect.
+    # Список ключей правится в копии и подменяется целиком, так что поиск без
+    # блокировки всегда читает согласованный список. Запись, которой уже нет
+    # в словаре, поиск просто пропускает.
+    def add(self, kind, obj_id, label, weight=None):
+        with self._lock:
+            previous = self._items.get((kind, obj_id))
+            old_keys = prefix_keys(previous[0]) if previous else set()
+            new_keys = prefix_keys(label)
+            keys = list(self._keys)
+            for key in old_keys - new_keys:
+                self._delete_key(keys, (key, kind, obj_id))
+            for key in new_keys - old_keys:
+                insort(keys, (key, kind, obj_id))
+            self._keys = keys
+            # Без явного веса сохраняем прежний (например, число книг писателя)
+            if weight is None:
+                weight = previous[1] if previous else 0
+            self._items[(kind, obj_id)] = (label, weight, normalize(label))
+
+    def remove(self, kind, obj_id):
+        with self._lock:
+            previous = self._items.pop((kind, obj_id), None)
+            if previous is None:
+                return
+            keys = list(self._keys)
+            for key in prefix_keys(previous[0]):
+                self._delete_key(keys, (key, kind, obj_id))
+            self._keys = keys
+
+    @staticmethod
+    def _delete_key(keys, entry):
+        position = bisect_left(keys, entry)
+        if position < len(keys) and keys[position] == entry:
+            del keys[position]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        keys, items = self._keys, self._items
+        found = {}
+        position = bisect_left(keys, (prefix,))
+        while position < len(keys) and len(found) < limit * SCAN_FACTOR:
+            key, kind, obj_id = keys[position]
+            if not key.startswith(prefix):
+                break
+            item = items.get((kind, obj_id))
+            if item is not None:
+                starts = item[2].startswith(prefix)
+                found[(kind, obj_id)] = (starts or found.get((kind, obj_id), (False,))[0], item)
+            position += 1
+
+        ranked = sorted(
+            found.items(),
+            key=lambda entry: (not entry[1][0], -entry[1][1][1], len(entry[1][1][0]), entry[1][1][0]),
+        )
+        return [
+            {'type': kind, 'id': obj_id, 'label': item[0]}
+            for (kind, obj_id), (_, item) in ranked[:limit]
+        ]
+
+    def dump(self):
+        return [[kind, obj_id, label, weight] for (kind, obj_id), (label, weight, _) in list(self._items.items())]
+
+
+# --- Источники данных ---
+def writer_label(user):
+    return ' '.join(part for part in (user.first_name, user.last_name, user.surname) if part)
+
+
+def collect_items():
+    for book_id, title, rating_count in Book.objects.filter(is_visible=True) \
+                                                   .values_list('id', 'title', 'rating_count').iterator():
+        yield 'book', book_id, title, rating_count
+
+    writers = User.objects.filter(role='writer').annotate(book_count=Count('book')).filter(book_count__gt=0)
+    for writer in writers.only('id', 'first_name', 'last_name', 'surname').iterator():
+        yield 'writer', writer.id, writer_label(writer), writer.book_count
+
+    for genre_id, name in Genre.objects.filter(is_active=True).values_list('id', 'name').iterator():
+        yield 'genre', genre_id, name, 0
+
+
+# --- Индекс процесса ---
+# Строится при разогреве (app.warmup) или при первом обращении. Сигналы обновляют
+# только индекс воркера, обработавшего запись, поэтому индекс периодически
+# перестраивается из базы в фоне, а запросы тем временем читают прежний.
+_index = None
+_index_lock = threading.Lock()
+_built_at = 0.0
+_refreshing = False
+
+
+def snapshot_path():
+    return getattr(settings, 'AUTOCOMPLETE_SNAPSHOT', None)
+
+
+def refresh_interval():
+    return getattr(settings, 'AUTOCOMPLETE_REFRESH_INTERVAL', 300)
+
+
+def build_index(use_snapshot=True):
+    index = PrefixIndex()
+    path = snapshot_path()
+    if use_snapshot and path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            index.load(tuple(item) for item in json.load(f))
+    else:
+        index.load(collect_items())
+    return index
+
+
+def get_index():
+    global _index, _built_at
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index()
+                _built_at = time.monotonic()
+    elif refresh_interval() and time.monotonic() - _built_at > refresh_interval():
+        schedule_refresh()
+    return _index
+
+
+def schedule_refresh():
+    global _refreshing
+    with _index_lock:
+        if _refreshing:
+            return
+        _refreshing = True
+    threading.Thread(target=refresh_in_background, name='autocomplete-refresh', daemon=True).start()
+
+
+def refresh_index():
+    global _index, _built_at
+    index = build_index(use_snapshot=False)
+    with _index_lock:
+        _index = index
+        _built_at = time.monotonic()
+
+
+def refresh_in_background():
+    global _built_at, _refreshing
+    try:
+        refresh_index()
+    except Exception:
+        logger.exception('Failed to rebuild the autocomplete index')
+        # Следующая попытка — через интервал, а не на каждом запросе
+        _built_at = time.monotonic()
+    finally:
+        _refreshing = False
+        # Соединение открыто в служебном потоке: закрываем, чтобы не висело
+        connection.close()
+
+
+def loaded_index():
+    return _index
+
+
+def save_snapshot(path):
+    index = PrefixIndex()
+    index.load(collect_items())
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index.dump(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return len(index)
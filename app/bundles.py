@@ -0,0 +1,203 @@
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import zipfile
+
+from django.db.models import Prefetch
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+
+from .models import Book, Chapter, ChapterImage
+from .tasks import static_path
+
+
+BUNDLE_FORMAT = 1
+# Изображения в архиве уменьшаются до этой стороны и пережимаются
+IMAGE_MAX_SIZE = 1600
+IMAGE_QUALITY = 80
+RANGE_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def bundle_url(book_id, version):
+    return f'/static/books/{book_id}/bundle-{version}.zip'
+
+
+def load_book(book_id):
+    chapters = Chapter.objects.filter(is_deleted=False).with_order().prefetch_related(
+        Prefetch('images', queryset=ChapterImage.objects.order_by('order', 'id'))
+    )
+    return Book.objects.select_related('author') \
+                       .prefetch_related('genres', Prefetch('chapters', queryset=chapters)) \
+                       .filter(pk=book_id, is_deleted=False).first()
+
+
+# --- Версия архива: хэш всего, что в него попадает ---
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(RANGE_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(documents, images):
+    digest = hashlib.sha256(f'format:{BUNDLE_FORMAT}'.encode())
+    for name, document in documents:
+        digest.update(name.encode())
+        digest.update(json.dumps(document, sort_keys=True, default=str).encode())
+    for name, path in images:
+        digest.update(name.encode())
+        digest.update(file_digest(path).encode())
+    return digest.hexdigest()[:16]
+
+
+# --- Содержимое архива ---
+def image_name(image):
+    return f'images/{image.chapter_id}/{image.id}-{os.path.basename(image.image.name)}'
+
+
+def collect(book):
+    from .serializers import BookDetailSerializer, ChapterDetailSerializer
+
+    book_data = BookDetailSerializer(book).data
+    book_data.pop('bundle', None)
+    documents = [('book.json', book_data)]
+    images = []
+
+    if book.cover and os.path.exists(static_path(book.cover)):
+        images.append(('cover.jpg', static_path(book.cover)))
+        book_data['cover'] = 'cover.jpg'
+
+    for chapter in book.chapters.all():
+        data = ChapterDetailSerializer(chapter).data
+        for image, image_data in zip(chapter.images.all(), data['images']):
+            path = static_path(image.image.name)
+            # Файл еще обрабатывается воркером: архив пересоберется по его завершении
+            if not os.path.exists(path):
+                image_data['image'] = None
+                continue
+            image_data['image'] = image_name(image)
+            images.append((image_name(image), path))
+        documents.append((f'chapters/{chapter.order:04d}-{chapter.id}.json', data))
+
+    return documents, images
+
+
+# Формат сохраняется, чтобы не расходиться с расширением в имени файла;
+# прочие форматы кладутся в архив как есть
+def optimize_image(path):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        if image.format not in ('JPEG', 'PNG'):
+            return None
+        image_format = image.format
+        image.thumbnail((IMAGE_MAX_SIZE, IMAGE_MAX_SIZE))
+        output = io.BytesIO()
+        if image_format == 'JPEG':
+            image.convert('RGB').save(output, 'JPEG', quality=IMAGE_QUALITY, optimize=True, progressive=True)
+        else:
+            image.save(output, 'PNG', optimize=True)
+    return output.getvalue()
+
+
+def write_bundle(destination, documents, images):
+    directory = os.path.dirname(destination)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f, zipfile.ZipFile(f, 'w') as bundle:
+            for name, document in documents:
+                bundle.writestr(name, json.dumps(document, ensure_ascii=False, default=str),
+                                compress_type=zipfile.ZIP_DEFLATED)
+            for name, path in images:
+                try:
+                    data = optimize_image(path)
+                except OSError:
+                    data = None
+                if data is None:
+                    with open(path, 'rb') as image:
+                        data = image.read()
+                # Изображения уже сжаты — повторно не сжимаем
+                bundle.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+        os.replace(temp_path, destination)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+# --- Сборка архива книги ---
+def build_bundle(book_id):
+    book = load_book(book_id)
+    if book is None:
+        return None
+
+    documents, images = collect(book)
+    version = content_hash(documents, images)
+    url = bundle_url(book.id, version)
+    destination = static_path(url)
+
+    if book.bundle != url or not os.path.exists(destination):
+        write_bundle(destination, documents, images)
+        Book.objects.filter(pk=book.id).update(bundle=url)
+
+    # Старые версии больше не нужны
+    directory = os.path.dirname(destination)
+    for name in os.listdir(directory):
+        if name.startswith('bundle-') and name.endswith('.zip') and name != os.path.basename(destination):
+            os.remove(os.path.join(directory, name))
+    return url
+
+
+# --- Отдача файла с поддержкой Range и If-Range ---
+def iter_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(request, path, etag, content_type, filename=None, cache_control='no-cache'):
+    size = os.path.getsize(path)
+    etag = f'"{etag}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    match = RANGE_RE.match(request.headers.get('Range', '').replace(' ', ''))
+    if_range = request.headers.get('If-Range')
+    if match and (if_range is None or if_range == etag) and any(match.groups()):
+        first, last = match.groups()
+        if first:
+            start, end = int(first), (min(int(last), size - 1) if last else size - 1)
+        else:
+            start, end = max(size - int(last), 0), size - 1
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        response = StreamingHttpResponse(iter_range(path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    if filename:
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
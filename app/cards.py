@@ -0,0 +1,81 @@
+from django.db import transaction
+
+from .models import Book, BookCard
+
+
+CARD_FIELDS = ('title', 'description', 'cover', 'created_at', 'rating_count', 'rating_sum',
+               'chapter_count', 'word_count', 'char_count', 'image_count', 'reading_time')
+
+
+def encode_genre_ids(genre_ids):
+    return ',' + ','.join(str(genre_id) for genre_id in sorted(genre_ids)) + ',' if genre_ids else ''
+
+
+def genre_filter_value(genre_id):
+    return f',{genre_id},'
+
+
+# --- Строка карточки из книги, ее автора и жанров ---
+def build_card(book, genres):
+    author = book.author
+    genres = sorted(genres, key=lambda genre: genre.id)
+    return BookCard(
+        book_id=book.id,
+        author_id=author.id,
+        author_first_name=author.first_name,
+        author_last_name=author.last_name,
+        author_surname=author.surname,
+        genre_ids=encode_genre_ids([genre.id for genre in genres]),
+        genres=[{'id': genre.id, 'name': genre.name} for genre in genres],
+        average_rating=book.rating_sum / book.rating_count if book.rating_count else None,
+        **{field: getattr(book, field) for field in CARD_FIELDS},
+    )
+
+
+# --- Обновление карточек из сигналов (в той же транзакции, что и изменение) ---
+UPSERT_FIELDS = [*CARD_FIELDS, 'author', 'author_first_name', 'author_last_name', 'author_surname',
+                 'genre_ids', 'genres', 'average_rating']
+
+
+def refresh_cards(book_ids):
+    book_ids = list(book_ids)
+    if not book_ids:
+        return
+    books = Book.objects.filter(pk__in=book_ids, is_visible=True, is_deleted=False) \
+                        .select_related('author') \
+                        .prefetch_related('genres')
+    built = [build_card(book, book.genres.all()) for book in books]
+
+    BookCard.objects.filter(pk__in=set(book_ids) - {card.book_id for card in built}).delete()
+    BookCard.objects.bulk_create(built, update_conflicts=True, unique_fields=['book'], update_fields=UPSERT_FIELDS)
+
+
+def refresh_book_card(book_id):
+    refresh_cards([book_id])
+
+
+def update_author_cards(user):
+    BookCard.objects.filter(author=user).update(
+        author_first_name=user.first_name,
+        author_last_name=user.last_name,
+        author_surname=user.surname,
+    )
+
+
+def genre_card_ids(genre_id):
+    return list(BookCard.objects.filter(genre_ids__contains=genre_filter_value(genre_id))
+                                .values_list('book_id', flat=True))
+
+
+# --- Полная перестройка ---
+def rebuild_cards(batch_size=500):
+    books = Book.objects.filter(is_visible=True, is_deleted=False) \
+                        .select_related('author') \
+                        .prefetch_related('genres') \
+                        .order_by('id')
+    cards = [build_card(book, book.genres.all()) for book in books.iterator(chunk_size=batch_size)]
+
+    with transaction.atomic():
+        BookCard.objects.all().delete()
+        BookCard.objects.bulk_create(cards, batch_size=batch_size)
+    return len(cards)
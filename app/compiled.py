@@ -0,0 +1,116 @@
+from operator import attrgetter
+
+from django.db.models.manager import BaseManager
+from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+
+
+# Поля, чье представление зависит только от значения (не от контекста запроса):
+# их экземпляры из плана можно делить между всеми сериализаторами класса
+CONTEXT_FREE_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.ChoiceField, serializers.DateField,
+    serializers.DateTimeField, serializers.DecimalField, serializers.FloatField, serializers.IntegerField,
+    serializers.JSONField, serializers.ReadOnlyField, serializers.StringRelatedField, serializers.TimeField,
+    serializers.UUIDField,
+)
+
+VALUE, METHOD, NESTED, NESTED_MANY, FIELD = range(5)
+
+
+def model_attributes(model):
+    names = set()
+    for field in model._meta.concrete_fields:
+        names.update((field.name, field.attname))
+    return names
+
+
+# --- Сериализатор с планом полей, построенным один раз на класс ---
+# ModelSerializer заново строит поля (и заново разбирает модель) для каждого
+# экземпляра, в том числе для каждого вложенного. Здесь поля класса разбираются
+# один раз, и выдача строки идет по готовому списку (имя, чтение атрибута, вид):
+# - простые поля — общий экземпляр поля и attrgetter для полей модели;
+# - SerializerMethodField — метод текущего сериализатора;
+# - вложенные CompiledModelSerializer — по их собственному плану;
+# - остальное (файлы, гиперссылки, связи по pk) — обычный путь DRF через self.fields.
+# Запись (to_internal_value, validate, save) не меняется.
+class CompiledModelSerializer(serializers.ModelSerializer):
+    compiled = True
+
+    @classmethod
+    def get_plan(cls):
+        plan = cls.__dict__.get('_plan')
+        if plan is None:
+            plan = cls._plan = cls.compile_plan()
+        return plan
+
+    @classmethod
+    def compile_plan(cls):
+        attributes = model_attributes(cls.Meta.model)
+        plan = []
+        for field in cls().fields.values():
+            if field.write_only:
+                continue
+            name = field.field_name
+
+            if isinstance(field, serializers.SerializerMethodField):
+                plan.append((name, None, METHOD, field.method_name))
+                continue
+
+            source = '.'.join(field.source_attrs)
+            getter = attrgetter(source) if source in attributes else field.get_attribute
+            child = field.child if isinstance(field, serializers.ListSerializer) else field
+
+            if isinstance(child, CompiledModelSerializer) and field.source != '*':
+                child_class = type(child)
+                child_class.get_plan()
+                kind = NESTED_MANY if child is not field else NESTED
+                plan.append((name, getter, kind, child_class))
+            elif isinstance(field, CONTEXT_FREE_FIELDS) and field.source != '*':
+                plan.append((name, getter, VALUE, field.to_representation))
+            else:
+                plan.append((name, None, FIELD, None))
+        return plan
+
+    def nested_serializer(self, name, serializer_class):
+        # Один вложенный сериализатор на поле: строки рендерятся им по очереди
+        nested = self.__dict__.setdefault('_nested', {})
+        serializer = nested.get(name)
+        if serializer is None:
+            serializer = nested[name] = serializer_class(context=self.context)
+        return serializer
+
+    def to_representation(self, instance):
+        if not self.compiled:
+            return super().to_representation(instance)
+
+        ret = {}
+        for name, getter, kind, target in self.get_plan():
+            if kind == METHOD:
+                ret[name] = getattr(self, target)(instance)
+                continue
+            if kind == FIELD:
+                field = self.fields[name]
+                try:
+                    attribute = field.get_attribute(instance)
+                except SkipField:
+                    continue
+                check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+                ret[name] = None if check_for_none is None else field.to_representation(attribute)
+                continue
+
+            try:
+                value = getter(instance)
+            except SkipField:
+                continue
+            if value is None:
+                ret[name] = None
+            elif kind == VALUE:
+                ret[name] = target(value)
+            elif kind == NESTED:
+                ret[name] = self.nested_serializer(name, target).to_representation(value)
+            else:
+                serializer = self.nested_serializer(name, target)
+                items = value.all() if isinstance(value, BaseManager) else value
+                ret[name] = [serializer.to_representation(item) for item in items]
+        return ret
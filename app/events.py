@@ -0,0 +1,139 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+DEFAULTS = {
+    'BROKER': 'app.events.InProcessBroker',
+    # Сколько последних событий книги хранить для переподключения по Last-Event-ID
+    'HISTORY_SIZE': 200,
+    'HEARTBEAT': 15,
+    'RETRY_MS': 3000,
+    # Отстающий подписчик отключается; клиент переподключится и дочитает историю
+    'QUEUE_SIZE': 100,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'BOOK_EVENTS', {})}
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    config = get_config()
+    return import_string(config['BROKER'])(config)
+
+
+def publish(book_id, event, data):
+    # Подписчики не должны увидеть данные откатившейся транзакции
+    transaction.on_commit(lambda: get_broker().publish(book_id, event, data))
+
+
+def format_event(event_id, event, data):
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f'id: {event_id}\nevent: {event}\ndata: {payload}\n\n'
+
+
+# --- Подписка одного клиента ---
+class Subscription:
+    def __init__(self, loop, queue_size):
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+        self.overflowed = False
+
+    def push(self, message):
+        # Вызывается в цикле событий подписчика
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        if self.overflowed and self.queue.empty():
+            return None
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+# --- Брокер внутри процесса ---
+# Подходит для одного процесса ASGI-сервера; для нескольких воркеров
+# BOOK_EVENTS["BROKER"] заменяется классом с тем же интерфейсом поверх общего хранилища.
+class InProcessBroker:
+    def __init__(self, config):
+        self.history_size = config['HISTORY_SIZE']
+        self.queue_size = config['QUEUE_SIZE']
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.history = {}
+        self.sequence = {}
+
+    def publish(self, book_id, event, data):
+        with self.lock:
+            event_id = self.sequence.get(book_id, 0) + 1
+            self.sequence[book_id] = event_id
+            message = (event_id, format_event(event_id, event, data))
+            self.history.setdefault(book_id, deque(maxlen=self.history_size)).append(message)
+            subscribers = list(self.subscribers.get(book_id, ()))
+
+        # Сигналы приходят из потоков синхронных представлений, очереди живут в цикле событий
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.push, message)
+
+    def subscribe(self, book_id, last_event_id=None):
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self.lock:
+            self.subscribers.setdefault(book_id, set()).add(subscription)
+            history = list(self.history.get(book_id, ()))
+            current = self.sequence.get(book_id, 0)
+
+        # None — пропущенное уже вытеснено из истории (или брокер перезапущен),
+        # клиенту нужно перечитать книгу целиком
+        if last_event_id is None or last_event_id == current:
+            missed = []
+        elif last_event_id > current:
+            missed = None
+        else:
+            missed = [message for message in history if message[0] > last_event_id]
+            if not missed or missed[0][0] != last_event_id + 1:
+                missed = None
+        return subscription, missed
+
+    def unsubscribe(self, book_id, subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(book_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[book_id]
+
+
+# --- Поток событий для StreamingHttpResponse ---
+async def event_stream(book_id, last_event_id=None):
+    config = get_config()
+    broker = get_broker()
+    subscription, missed = broker.subscribe(book_id, last_event_id)
+    try:
+        yield f"retry: {config['RETRY_MS']}\n\n"
+        if missed is None:
+            yield 'event: reset\ndata: {}\n\n'
+        for _, message in missed or ():
+            yield message
+
+        while True:
+            try:
+                message = await subscription.get(config['HEARTBEAT'])
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if message is None:
+                return
+            yield message[1]
+    finally:
+        broker.unsubscribe(book_id, subscription)
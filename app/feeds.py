@@ -0,0 +1,149 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .metrics import observe_cache
+from .models import Book, Comment, FeedEntry
+
+
+FEEDS = ('top', 'trending', 'new')
+
+# Априорное число оценок для байесовского среднего
+BAYES_PRIOR_COUNT = 10
+GLOBAL_MEAN_CACHE_KEY = 'feeds:global_mean'
+GLOBAL_MEAN_TIMEOUT = 600
+
+# Период полураспада активности для ленты популярного (в секундах)
+TRENDING_HALF_LIFE = 3 * 24 * 3600
+TRENDING_WINDOW = timedelta(seconds=TRENDING_HALF_LIFE * 10)
+
+
+# --- Средняя оценка по всему каталогу (обновляется не чаще раза в GLOBAL_MEAN_TIMEOUT) ---
+def compute_global_mean():
+    totals = Book.objects.aggregate(count=Sum('rating_count'), total=Sum('rating_sum'))
+    return totals['total'] / totals['count'] if totals['count'] else 0
+
+
+def get_global_mean():
+    global_mean = cache.get(GLOBAL_MEAN_CACHE_KEY)
+    observe_cache('feeds', global_mean is not None)
+    if global_mean is None:
+        global_mean = compute_global_mean()
+        cache.set(GLOBAL_MEAN_CACHE_KEY, global_mean, GLOBAL_MEAN_TIMEOUT)
+    return global_mean
+
+
+def bayesian_rating(book, global_mean):
+    return (BAYES_PRIOR_COUNT * global_mean + book.rating_sum) / (BAYES_PRIOR_COUNT + book.rating_count)
+
+
+# --- Затухающая во времени активность ---
+# Храним не сам счет, а log2(счет) + t / T½: порядок книг по такому ключу
+# не меняется со временем, поэтому его можно индексировать.
+# Счет — сумма 2^((t - now) / T½) по комментариям за TRENDING_WINDOW; так его
+# считают и полная перестройка, и инкрементальное обновление.
+def trending_time(moment):
+    return moment.timestamp() / TRENDING_HALF_LIFE
+
+
+def in_trending_window(moment, now):
+    return moment >= now - TRENDING_WINDOW
+
+
+def expire_trending_key(key, now):
+    # Ключ ниже начала окна: в окне не осталось ни одного комментария
+    if key is None or key < trending_time(now - TRENDING_WINDOW):
+        return None
+    return key
+
+
+def shift_trending_key(key, moment, now, weight=1):
+    # weight=1 — новый комментарий, weight=-1 — удаленный
+    if not in_trending_window(moment, now):
+        return expire_trending_key(key, now)
+    reference = trending_time(now)
+    score = (2 ** (key - reference) if key is not None else 0) + weight * 2 ** (trending_time(moment) - reference)
+    return expire_trending_key(reference + math.log2(score) if score > 0 else None, now)
+
+
+def trending_key(moments):
+    times = [trending_time(moment) for moment in moments]
+    if not times:
+        return None
+    peak = max(times)
+    return peak + math.log2(sum(2 ** (t - peak) for t in times))
+
+
+def build_entries(book, genre_ids, scores):
+    entries = []
+    for feed, score in scores.items():
+        if score is None:
+            continue
+        for genre_id in [None, *genre_ids]:
+            entries.append(FeedEntry(feed=feed, genre_id=genre_id, book_id=book.id, score=score))
+    return entries
+
+
+# --- Инкрементальное обновление лент одной книги ---
+def update_book_feeds(book_id, commented_at=None, uncommented_at=None):
+    with transaction.atomic():
+        try:
+            book = Book.objects.select_for_update().get(pk=book_id)
+        except Book.DoesNotExist:
+            return
+
+        previous = FeedEntry.objects.filter(book_id=book_id, feed='trending', genre__isnull=True) \
+                                    .values_list('score', flat=True).first()
+        FeedEntry.objects.filter(book_id=book_id).delete()
+
+        if not book.is_visible:
+            return
+
+        now = timezone.now()
+        trending = expire_trending_key(previous, now)
+        if commented_at:
+            trending = shift_trending_key(trending, commented_at, now)
+        if uncommented_at:
+            trending = shift_trending_key(trending, uncommented_at, now, weight=-1)
+        scores = {
+            'top': bayesian_rating(book, get_global_mean()) if book.rating_count else None,
+            'trending': trending,
+            'new': book.created_at.timestamp(),
+        }
+        genre_ids = list(book.genres.values_list('id', flat=True))
+        FeedEntry.objects.bulk_create(build_entries(book, genre_ids, scores))
+
+
+# --- Полная перестройка всех лент ---
+def rebuild_feeds():
+    global_mean = compute_global_mean()
+    cache.set(GLOBAL_MEAN_CACHE_KEY, global_mean, GLOBAL_MEAN_TIMEOUT)
+
+    activity = defaultdict(list)
+    recent = Comment.objects.filter(created_at__gte=timezone.now() - TRENDING_WINDOW)
+    for book_id, created_at in recent.values_list('book_id', 'created_at').iterator():
+        activity[book_id].append(created_at)
+
+    genres = defaultdict(list)
+    for book_id, genre_id in Book.genres.through.objects.values_list('book_id', 'genre_id').iterator():
+        genres[book_id].append(genre_id)
+
+    entries = []
+    for book in Book.objects.filter(is_visible=True).only('id', 'created_at', 'rating_count', 'rating_sum').iterator():
+        scores = {
+            'top': bayesian_rating(book, global_mean) if book.rating_count else None,
+            'trending': trending_key(activity.get(book.id, [])),
+            'new': book.created_at.timestamp(),
+        }
+        entries.extend(build_entries(book, genres[book.id], scores))
+
+    with transaction.atomic():
+        FeedEntry.objects.all().delete()
+        FeedEntry.objects.bulk_create(entries, batch_size=1000)
+
+    return len(entries)
@@ -0,0 +1,105 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from rest_framework.exceptions import Throttled
+
+from .metrics import registry
+
+
+DEFAULTS = {
+    # Сколько хэшей считается одновременно; остальные ядра остаются чтению
+    'WORKERS': 2,
+    'QUEUE_SIZE': 16,
+    # Сколько запрос может ждать очереди, прежде чем получит 429
+    'QUEUE_TIMEOUT': 5,
+    # None — значение Django по умолчанию; при смене старые хэши обновятся при входе
+    'ITERATIONS': None,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'AUTH_HASHING', {})}
+
+
+# --- Ограниченный пул для хэширования паролей ---
+# hashlib.pbkdf2_hmac отпускает GIL, поэтому отдельные потоки действительно
+# считают параллельно, а ограничение их числа не дает всплеску входов
+# занять все ядра и потоки, обслуживающие чтение.
+class HashingPool:
+    def __init__(self, workers, queue_size, queue_timeout):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='auth-hash')
+        self.workers = workers
+        self.limit = workers + queue_size
+        self.queue_timeout = queue_timeout
+        self.lock = threading.Lock()
+        self.pending = 0
+        # Скользящее среднее времени одного хэша, для Retry-After
+        self.average = 0.1
+
+    def retry_after(self):
+        return max(1, math.ceil(self.pending * self.average / self.workers))
+
+    def reject(self):
+        registry.inc('auth_hash_rejected_total', {})
+        raise Throttled(wait=self.retry_after(), detail='Слишком много попыток входа, повторите позже.')
+
+    def timed(self, func, args):
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            duration = time.perf_counter() - start
+            self.average = self.average * 0.9 + duration * 0.1
+            registry.observe('auth_hash_seconds', {}, duration)
+
+    def run(self, func, *args):
+        with self.lock:
+            if self.pending >= self.limit:
+                self.reject()
+            self.pending += 1
+
+        try:
+            future = self.executor.submit(self.timed, func, args)
+            try:
+                return future.result(timeout=self.queue_timeout)
+            except TimeoutError:
+                # Еще не начатую задачу снимаем, начатую дожидаемся
+                if future.cancel():
+                    self.reject()
+                return future.result()
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # Пул создается лениво, уже в процессе воркера после fork
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = get_config()
+                _pool = HashingPool(config['WORKERS'], config['QUEUE_SIZE'], config['QUEUE_TIMEOUT'])
+    return _pool
+
+
+# --- PBKDF2 через пул, с настраиваемым числом итераций ---
+# Алгоритм тот же (pbkdf2_sha256), поэтому существующие хэши проверяются как прежде;
+# если число итераций изменилось, Django пересчитает хэш при следующем входе.
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return get_config()['ITERATIONS'] or PBKDF2PasswordHasher.iterations
+
+    def encode(self, password, salt, iterations=None):
+        if not get_config()['WORKERS']:
+            return super().encode(password, salt, iterations)
+        return get_pool().run(super().encode, password, salt, iterations)
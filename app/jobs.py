@@ -0,0 +1,176 @@
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 3600
+# Задачи, от которых столько времени нет отметки (heartbeat), считаем брошенными упавшим воркером
+LOCK_TIMEOUT = timedelta(minutes=30)
+
+_handlers = {}
+_failure_handlers = {}
+
+
+# --- Регистрация обработчиков ---
+def job_handler(name):
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+# Вызывается, когда попытки задачи исчерпаны: прибрать то, что она оставила бы после себя
+def failure_handler(name):
+    def decorator(func):
+        _failure_handlers[name] = func
+        return func
+    return decorator
+
+
+def get_handler(name):
+    return _handlers[name]
+
+
+# --- Постановка задачи в очередь ---
+def enqueue(name, payload=None, priority=0, dedup_key=None, delay=None, max_attempts=5, user=None):
+    fields = {
+        'name': name,
+        'payload': payload or {},
+        'priority': priority,
+        'max_attempts': max_attempts,
+        'run_at': timezone.now() + (delay or timedelta()),
+        'user': user,
+    }
+
+    if dedup_key is None:
+        job = Job.objects.create(**fields)
+    else:
+        try:
+            with transaction.atomic():
+                job = Job.objects.create(dedup_key=dedup_key, **fields)
+        except IntegrityError:
+            # Такая же задача уже ждет в очереди
+            job = Job.objects.filter(dedup_key=dedup_key).first()
+            if job is None:
+                return enqueue(name, payload, priority, dedup_key, delay, max_attempts, user)
+            return job
+
+    if getattr(settings, 'JOBS_RUN_INLINE', False):
+        transaction.on_commit(lambda: run_job(job.pk, worker_id='inline'))
+
+    return job
+
+
+# --- Захват следующей задачи ---
+def claim_next(worker_id):
+    now = timezone.now()
+    candidates = Job.objects.filter(status='queued', run_at__lte=now) \
+                            .order_by('-priority', 'run_at', 'id') \
+                            .values_list('id', flat=True)[:10]
+
+    for job_id in candidates:
+        # Условное обновление: задачу получит только один воркер
+        claimed = Job.objects.filter(pk=job_id, status='queued').update(
+            status='running',
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+            dedup_key=None,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def retry_delay(attempts):
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+# --- Выполнение задачи ---
+def execute(job):
+    try:
+        get_handler(job.name)(job)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s #%s failed (attempt %s)', job.name, job.id, job.attempts)
+
+        if job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status='queued',
+                run_at=timezone.now() + retry_delay(job.attempts),
+                locked_by='',
+                locked_at=None,
+                last_error=error,
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(status='failed', finished_at=timezone.now(), last_error=error)
+            run_failure_handler(job)
+        return False
+
+    Job.objects.filter(pk=job.pk).update(status='done', finished_at=timezone.now(), locked_by='', locked_at=None)
+    return True
+
+
+def run_failure_handler(job):
+    handler = _failure_handlers.get(job.name)
+    if handler is None:
+        return
+    try:
+        handler(job)
+    except Exception:
+        logger.exception('Failure handler of job %s #%s failed', job.name, job.id)
+
+
+def run_job(job_id, worker_id):
+    claimed = Job.objects.filter(pk=job_id, status='queued').update(
+        status='running', locked_by=worker_id, locked_at=timezone.now(), attempts=F('attempts') + 1, dedup_key=None,
+    )
+    if claimed:
+        execute(Job.objects.get(pk=job_id))
+
+
+# --- Отметка живой задачи: долгие обработчики вызывают ее между шагами ---
+def heartbeat(job):
+    Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by).update(locked_at=timezone.now())
+
+
+def report_progress(job, **progress):
+    job.progress = {**job.progress, **progress}
+    Job.objects.filter(pk=job.pk).update(progress=job.progress)
+    heartbeat(job)
+
+
+# --- Задачи, зависшие у упавших воркеров ---
+# Попытки остались — задача возвращается в очередь; исчерпаны (например, задача
+# сама роняет воркер) — помечается неудачной, как после последней ошибки
+def requeue_stale():
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - LOCK_TIMEOUT)
+
+    for job in stale.filter(attempts__gte=F('max_attempts')):
+        failed = Job.objects.filter(pk=job.pk, status='running', locked_at=job.locked_at).update(
+            status='failed', finished_at=now, last_error=f'Worker {job.locked_by} stopped responding',
+        )
+        if failed:
+            logger.warning('Job %s #%s abandoned after %s attempts', job.name, job.id, job.attempts)
+            run_failure_handler(job)
+
+    return stale.filter(attempts__lt=F('max_attempts')).update(status='queued', locked_by='', locked_at=None)
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
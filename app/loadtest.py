@@ -0,0 +1,323 @@
+import asyncio
+import base64
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+from django.urls import Resolver404, resolve
+
+
+# --- Синтетическая смесь запросов (вес, метод, путь) ---
+# {book}, {chapter} и {prefix} подставляются из данных, найденных на сервере.
+# auth: запрос отправляется с токеном; без учетных данных такие строки пропускаются.
+SYNTHETIC_MIX = [
+    {'weight': 20, 'method': 'GET', 'path': '/api/books/'},
+    {'weight': 8, 'method': 'GET', 'path': '/api/books/?sort_field=date&sort_direction=desc'},
+    {'weight': 15, 'method': 'GET', 'path': '/api/books/{book}/'},
+    {'weight': 8, 'method': 'GET', 'path': '/api/books/{book}/comments/'},
+    {'weight': 4, 'method': 'GET', 'path': '/api/books/{book}/similar/'},
+    {'weight': 15, 'method': 'GET', 'path': '/api/books/{book}/chapter/{chapter}/read/'},
+    {'weight': 5, 'method': 'GET', 'path': '/api/feeds/top/'},
+    {'weight': 5, 'method': 'GET', 'path': '/api/feeds/trending/'},
+    {'weight': 6, 'method': 'GET', 'path': '/api/autocomplete/?q={prefix}'},
+    {'weight': 3, 'method': 'GET', 'path': '/api/genres/'},
+    {'weight': 3, 'method': 'GET', 'path': '/api/writers/'},
+    {'weight': 3, 'method': 'GET', 'path': '/api/mybooks/', 'auth': True},
+    {'weight': 2, 'flow': 'login'},
+    {'weight': 3, 'flow': 'refresh'},
+]
+
+LOGIN_PATH = '/api/login/'
+REFRESH_PATH = '/api/token/refresh/'
+# Обновляем access-токен заранее, чтобы он не истек в пути
+REFRESH_MARGIN = 10
+
+
+class LoadTestError(Exception):
+    pass
+
+
+# --- Минимальный HTTP/1.1 клиент на asyncio ---
+def decode_chunked(data):
+    body = b''
+    while data:
+        size_line, _, data = data.partition(b'\r\n')
+        size = int(size_line.split(b';')[0], 16)
+        if size == 0:
+            break
+        body += data[:size]
+        data = data[size + 2:]
+    return body
+
+
+async def http_request(host, port, method, path, headers=None, body=None, timeout=30):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        data = json.dumps(body).encode() if body is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {host}:{port}', 'Connection: close', 'Accept: application/json']
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        lines.append(f'Content-Length: {len(data)}')
+        lines.extend(f'{name}: {value}' for name, value in (headers or {}).items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + data)
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+
+    head, _, payload = raw.partition(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    response_headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        response_headers[name.strip().lower()] = value.strip()
+    if response_headers.get('transfer-encoding') == 'chunked':
+        payload = decode_chunked(payload)
+    return int(status_line.split()[1]), payload
+
+
+def route_label(path):
+    try:
+        return resolve(urlsplit(path).path).route
+    except Resolver404:
+        return 'unmatched'
+
+
+def token_expiry(token):
+    payload = token.split('.')[1]
+    payload += '=' * (-len(payload) % 4)
+    return json.loads(base64.urlsafe_b64decode(payload))['exp']
+
+
+# --- Статистика по маршрутам ---
+def percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, route, latency, status):
+        self.latencies[route].append(latency)
+        self.statuses[route][status] += 1
+
+    def summarize(self, route, duration):
+        latencies = sorted(self.latencies[route])
+        statuses = self.statuses[route]
+        count = len(latencies)
+        errors = sum(n for status, n in statuses.items() if status == 'error' or status >= 500)
+        return {
+            'count': count,
+            'throughput': round(count / duration, 2) if duration else None,
+            'errors': errors,
+            'error_rate': round(errors / count, 4) if count else 0,
+            'client_errors': sum(n for status, n in statuses.items() if status != 'error' and 400 <= status < 500),
+            'status': {str(status): n for status, n in sorted(statuses.items(), key=lambda item: str(item[0]))},
+            'latency_ms': {
+                'mean': round(sum(latencies) / count * 1000, 2) if count else None,
+                **{name: round(percentile(latencies, fraction) * 1000, 2) if count else None
+                   for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p95', 0.95), ('p99', 0.99))},
+                'max': round(latencies[-1] * 1000, 2) if count else None,
+            },
+        }
+
+    def report(self, duration):
+        routes = {route: self.summarize(route, duration) for route in sorted(self.latencies)}
+        total = Stats()
+        for route in self.latencies:
+            total.latencies['*'].extend(self.latencies[route])
+            total.statuses['*'].update(self.statuses[route])
+        return {'total': total.summarize('*', duration), 'routes': routes}
+
+
+# --- Генератор нагрузки ---
+# Открытая модель: запросы приходят по расписанию независимо от ответов,
+# а задержка считается от запланированного момента, поэтому очередь
+# перед ограничителем параллельности тоже попадает в результат.
+class LoadGenerator:
+    def __init__(self, base_url, concurrency=10, timeout=30, username=None, password=None, seed=None):
+        url = urlsplit(base_url)
+        if url.scheme != 'http':
+            raise LoadTestError('Поддерживается только http://')
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.username = username
+        self.password = password
+        self.random = random.Random(seed)
+        self.stats = Stats()
+        self.access = None
+        self.refresh = None
+        self.access_expiry = 0
+        self.auth_lock = None
+        self.fixtures = {}
+
+    async def call(self, method, path, body=None, auth=False):
+        headers = {}
+        if auth:
+            await self.ensure_token()
+            headers['Authorization'] = f'Bearer {self.access}'
+        status, payload = await http_request(self.host, self.port, method, path, headers, body, self.timeout)
+        if auth and status == 401:
+            self.access = None
+        return status, payload
+
+    # --- JWT: вход и обновление токена ---
+    async def login(self):
+        status, payload = await http_request(self.host, self.port, 'POST', LOGIN_PATH, body={
+            'username': self.username, 'password': self.password,
+        }, timeout=self.timeout)
+        if status != 200:
+            raise LoadTestError(f'Вход не удался: {status}')
+        self.store_tokens(json.loads(payload))
+        return status
+
+    async def refresh_token(self):
+        if self.refresh is None:
+            return await self.login()
+        status, payload = await http_request(self.host, self.port, 'POST', REFRESH_PATH, body={
+            'refresh': self.refresh,
+        }, timeout=self.timeout)
+        if status != 200:
+            self.access = self.refresh = None
+            return status
+        self.store_tokens(json.loads(payload))
+        return status
+
+    def store_tokens(self, tokens):
+        self.access = tokens['access']
+        self.refresh = tokens.get('refresh', self.refresh)
+        self.access_expiry = token_expiry(self.access)
+
+    async def ensure_token(self):
+        async with self.auth_lock:
+            if self.access is None:
+                await self.login()
+            elif self.access_expiry - time.time() < REFRESH_MARGIN:
+                await self.refresh_token()
+                if self.access is None:
+                    await self.login()
+
+    # --- Данные для подстановки в синтетические пути ---
+    async def discover(self):
+        status, payload = await http_request(self.host, self.port, 'GET', '/api/books/', timeout=self.timeout)
+        if status != 200:
+            raise LoadTestError(f'Не удалось получить список книг: {status}')
+        books = json.loads(payload)[:20]
+        if not books:
+            raise LoadTestError('На сервере нет книг для синтетической нагрузки')
+
+        chapters = []
+        for book in books:
+            status, payload = await http_request(self.host, self.port, 'GET', f"/api/books/{book['id']}/",
+                                                 timeout=self.timeout)
+            if status == 200:
+                chapters.extend((book['id'], chapter['id']) for chapter in json.loads(payload).get('chapters', []))
+
+        self.fixtures = {
+            'books': [book['id'] for book in books],
+            'chapters': chapters,
+            'prefixes': sorted({book['title'][:3] for book in books if book['title']}),
+        }
+
+    def synthetic_request(self, mix):
+        entry = self.random.choices(mix, weights=[item['weight'] for item in mix])[0]
+        if 'flow' in entry:
+            return {'flow': entry['flow']}
+
+        values = {'book': self.random.choice(self.fixtures['books'])}
+        if '{chapter}' in entry['path']:
+            if not self.fixtures['chapters']:
+                return None
+            values['book'], values['chapter'] = self.random.choice(self.fixtures['chapters'])
+        if '{prefix}' in entry['path']:
+            values['prefix'] = self.random.choice(self.fixtures['prefixes'])
+        return {'method': entry['method'], 'path': entry['path'].format(**values), 'auth': entry.get('auth', False)}
+
+    # --- Выполнение одного запроса ---
+    async def perform(self, semaphore, request, scheduled):
+        async with semaphore:
+            flow = request.get('flow')
+            route = route_label(LOGIN_PATH if flow == 'login' else REFRESH_PATH if flow == 'refresh' else request['path'])
+            try:
+                if flow == 'login':
+                    async with self.auth_lock:
+                        status = await self.login()
+                elif flow == 'refresh':
+                    async with self.auth_lock:
+                        status = await self.refresh_token()
+                else:
+                    status, _ = await self.call(request.get('method', 'GET'), request['path'],
+                                                request.get('body'), request.get('auth', False))
+            except (OSError, asyncio.TimeoutError, LoadTestError, ValueError):
+                status = 'error'
+            self.stats.record(route, time.perf_counter() - scheduled, status)
+
+    async def run(self, arrivals):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self.auth_lock = asyncio.Lock()
+        tasks = []
+        start = time.perf_counter()
+        for offset, request in arrivals:
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.perform(semaphore, request, start + offset)))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+
+# --- Расписания прихода запросов ---
+def poisson_offsets(rng, rate, duration):
+    offset = rng.expovariate(rate)
+    while offset < duration:
+        yield offset
+        offset += rng.expovariate(rate)
+
+
+def synthetic_arrivals(generator, rate, duration, mix=SYNTHETIC_MIX):
+    if generator.username is None:
+        mix = [item for item in mix if not item.get('auth') and 'flow' not in item]
+    for offset in poisson_offsets(generator.random, rate, duration):
+        request = generator.synthetic_request(mix)
+        if request is not None:
+            yield offset, request
+
+
+def load_log(path):
+    requests = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(entry, dict) or not ('path' in entry or entry.get('flow') in ('login', 'refresh')):
+                continue
+            requests.append(entry)
+    if not requests:
+        raise LoadTestError(f'В журнале {path} нет запросов (ожидаются строки с полем path)')
+    return requests
+
+
+def replay_arrivals(generator, requests, rate=None, speed=1.0, duration=None):
+    # Без rate сохраняем записанные интервалы (поле offset), иначе — пуассоновский поток
+    recorded = rate is None and all('offset' in entry for entry in requests)
+    if recorded:
+        requests = sorted(requests, key=lambda entry: entry['offset'])
+        first = requests[0]['offset']
+        offsets = ((entry['offset'] - first) / speed for entry in requests)
+    else:
+        offsets = poisson_offsets(generator.random, rate or 20, float('inf'))
+
+    for offset, entry in zip(offsets, requests):
+        if duration is not None and offset >= duration:
+            break
+        yield offset, entry
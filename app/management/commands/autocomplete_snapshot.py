@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.autocomplete import save_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Сохраняет снимок индекса автодополнения для быстрого старта воркеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None, help='По умолчанию settings.AUTOCOMPLETE_SNAPSHOT')
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.AUTOCOMPLETE_SNAPSHOT
+        if not path:
+            raise CommandError('Не задан путь: укажите --path или AUTOCOMPLETE_SNAPSHOT в настройках.')
+
+        count = save_snapshot(path)
+        self.stdout.write(f'Записей в индексе: {count}')
@@ -0,0 +1,46 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.models import CompressedContent
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает отдачу глав: сжатие на лету, готовый gzip и распаковка для клиентов без gzip'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=200, help='Сколько глав взять для замера')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = list(CompressedContent.objects.select_related('chapter')[:options['limit']])
+        if not rows:
+            self.stdout.write('Сжатых глав не найдено')
+            return
+
+        texts = [row.chapter.content.encode('utf-8') for row in rows]
+        blobs = [bytes(row.data) for row in rows]
+        raw_size = sum(len(text) for text in texts)
+        stored_size = sum(len(blob) for blob in blobs)
+
+        def measure(fn, items):
+            start = time.process_time()
+            for _ in range(options['repeat']):
+                for item in items:
+                    fn(item)
+            return (time.process_time() - start) / (options['repeat'] * len(items)) * 1000
+
+        results = [
+            ('gzip на лету (GZipMiddleware)', measure(lambda text: gzip.compress(text, compresslevel=6), texts)),
+            ('готовый gzip', measure(bytes, blobs)),
+            ('распаковка без gzip', measure(gzip.decompress, blobs)),
+        ]
+
+        self.stdout.write(f'Глав: {len(rows)}')
+        self.stdout.write(
+            f'Текст: {raw_size / 1024:.1f} КБ  сжатый: {stored_size / 1024:.1f} КБ  '
+            f'экономия: {(1 - stored_size / raw_size) * 100:.1f}%'
+        )
+        for name, ms in results:
+            self.stdout.write(f'{name:<32} {ms:.4f} мс CPU на запрос')
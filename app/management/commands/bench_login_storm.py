@@ -0,0 +1,80 @@
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.loadtest import LOGIN_PATH, Stats, http_request, poisson_offsets
+
+
+READ_PATHS = ['/api/books/', '/api/genres/', '/api/writers/', '/api/feeds/top/']
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает задержку чтения каталога без нагрузки и во время шторма входов '
+            '(проверка изоляции хэширования паролей)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--password', required=True)
+        parser.add_argument('--duration', type=float, default=10, help='Секунд на каждую фазу')
+        parser.add_argument('--read-rate', type=float, default=20)
+        parser.add_argument('--login-rate', type=float, default=20)
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http':
+            raise CommandError('Поддерживается только http://')
+        self.host, self.port = url.hostname, url.port or 80
+        self.options = options
+
+        report = asyncio.run(self.run())
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+    async def request(self, stats, label, method, path, body, scheduled):
+        try:
+            status, _ = await http_request(self.host, self.port, method, path, body=body,
+                                           timeout=self.options['timeout'])
+        except (OSError, asyncio.TimeoutError):
+            status = 'error'
+        stats.record(label, time.perf_counter() - scheduled, status)
+
+    async def phase(self, login_rate):
+        rng = random.Random(0)
+        stats = Stats()
+        duration = self.options['duration']
+        start = time.perf_counter()
+
+        arrivals = [(offset, 'read') for offset in poisson_offsets(rng, self.options['read_rate'], duration)]
+        if login_rate:
+            arrivals += [(offset, 'login') for offset in poisson_offsets(rng, login_rate, duration)]
+
+        tasks = []
+        for offset, kind in sorted(arrivals):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if kind == 'read':
+                request = self.request(stats, 'read', 'GET', rng.choice(READ_PATHS), None, start + offset)
+            else:
+                body = {'username': self.options['username'], 'password': self.options['password']}
+                request = self.request(stats, 'login', 'POST', LOGIN_PATH, body, start + offset)
+            tasks.append(asyncio.create_task(request))
+        await asyncio.gather(*tasks)
+        return stats.report(time.perf_counter() - start)['routes']
+
+    async def run(self):
+        baseline = await self.phase(login_rate=0)
+        storm = await self.phase(login_rate=self.options['login_rate'])
+
+        for name, routes in (('без входов', baseline), ('шторм входов', storm)):
+            read = routes['read']['latency_ms']
+            self.stderr.write(f"{name:<14} чтение p50 {read['p50']} мс  p95 {read['p95']} мс  p99 {read['p99']} мс")
+        if 'login' in storm:
+            self.stderr.write(f"входы: {storm['login']['status']}")
+
+        return {'baseline': baseline, 'storm': storm}
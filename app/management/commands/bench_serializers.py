@@ -0,0 +1,88 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app.compiled import CompiledModelSerializer
+from app.models import Book, BookCard, Chapter, ChapterImage, Genre, User
+from app.serializers import BookCardSerializer, BookDetailSerializer, BookSerializer, ChapterDetailSerializer
+
+
+# --- Строки в памяти: связи лежат в кэше prefetch, к базе замер не обращается ---
+def make_rows(count):
+    now = timezone.now()
+    genres = [Genre(id=i, name=f'Жанр {i}') for i in range(1, 4)]
+    author = User(id=1, username='author', first_name='Анна', last_name='Ли', surname='', role='writer')
+
+    books, cards = [], []
+    for i in range(1, count + 1):
+        book = Book(id=i, title=f'Книга {i}', description='Описание ' * 20, author=author, cover='',
+                    created_at=now - timedelta(minutes=i), rating_count=3, rating_sum=12, chapter_count=10,
+                    word_count=40000, char_count=250000, image_count=5, reading_time=200, bundle='')
+        chapters = []
+        for order in range(1, 11):
+            chapter = Chapter(id=i * 100 + order, book=book, title=f'Глава {order}', word_count=4000,
+                              char_count=25000, image_count=0, reading_time=20)
+            chapter.order = order
+            chapters.append(chapter)
+        book._prefetched_objects_cache = {'genres': genres, 'chapters': chapters}
+        books.append(book)
+        cards.append(BookCard(book_id=i, title=book.title, description=book.description, cover='',
+                              created_at=book.created_at, author=author, author_first_name=author.first_name,
+                              author_last_name=author.last_name, author_surname=author.surname,
+                              genre_ids=',1,2,3,', genres=[{'id': g.id, 'name': g.name} for g in genres],
+                              rating_count=3, rating_sum=12, average_rating=4.0, chapter_count=10,
+                              word_count=40000, char_count=250000, image_count=5, reading_time=200))
+
+    chapter = Chapter(id=1, book=books[0], title='Глава', content='Текст главы. ' * 500)
+    chapter.order = 1
+    chapter._prefetched_objects_cache = {
+        'images': [ChapterImage(id=i, chapter=chapter, image=f'books/1/{i}.jpg', caption='', order=i)
+                   for i in range(1, 6)],
+    }
+    return books, cards, chapter
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает стоимость сериализации строки: обычный ModelSerializer и план полей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, fn, repeat, rows):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best / rows * 1e6
+
+    def handle(self, *args, **options):
+        books, cards, chapter = make_rows(options['rows'])
+        cases = [
+            ('BookCardSerializer, список', lambda: BookCardSerializer(cards, many=True).data, len(cards)),
+            ('BookSerializer, список', lambda: BookSerializer(books, many=True).data, len(books)),
+            ('BookDetailSerializer, книга', lambda: BookDetailSerializer(books[0]).data, 1),
+            ('ChapterDetailSerializer, глава', lambda: ChapterDetailSerializer(chapter).data, 1),
+        ]
+
+        self.stdout.write(f"{'':<34}{'DRF, мкс':>12}{'план, мкс':>12}{'ускорение':>12}")
+        try:
+            for name, render, rows in cases:
+                CompiledModelSerializer.compiled = False
+                expected = render()
+                # Одиночные объекты повторяем чаще, чтобы замер не тонул в шуме таймера
+                repeat = options['repeat'] if rows > 1 else options['repeat'] * 200
+                before = self.measure(render, repeat, rows)
+
+                CompiledModelSerializer.compiled = True
+                if render() != expected:
+                    raise CommandError(f'{name}: результат плана отличается от ModelSerializer')
+                after = self.measure(render, repeat, rows)
+
+                self.stdout.write(f'{name:<34}{before:>12.1f}{after:>12.1f}{before / after:>11.1f}x')
+        finally:
+            CompiledModelSerializer.compiled = True
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app.recommendations import TOP_K, build_similar_books
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие книги (по жанрам и оценкам читателей)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Пересчитать все книги, а не только изменившиеся')
+        parser.add_argument('--top-k', type=int, default=TOP_K)
+
+    def handle(self, *args, **options):
+        count = build_similar_books(full=options['full'], top_k=options['top_k'])
+        self.stdout.write(f'Пересчитано книг: {count}')
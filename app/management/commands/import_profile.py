@@ -0,0 +1,74 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Загрузка воркера: то же, что делает wsgi.py, плюс первый доступ к маршрутам
+BOOT = '''
+import time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+if {warmup!r}:
+    from app.warmup import warm_up
+    warm_up()
+print('boot_ms', (time.perf_counter() - start) * 1000)
+'''
+
+LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(output):
+    modules = []
+    for line in output.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            modules.append({'name': name, 'self': int(own) / 1000, 'cumulative': int(cumulative) / 1000,
+                            'depth': (len(indent) - 1) // 2})
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Профиль импорта при запуске воркера (python -X importtime в отдельном процессе)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--warmup', action='store_true', help='Включить в замер разогрев app.warmup')
+        parser.add_argument('--prefix', default=None, help='Показать только модули с этим префиксом (например, app.)')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE, 'PYTHONDONTWRITEBYTECODE': '1'}
+        env.pop('DJANGO_PRELOAD', None)
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT.format(warmup=options['warmup'])],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f'Запуск завершился с ошибкой:\n{result.stderr[-2000:]}')
+
+        modules = parse_importtime(result.stderr)
+        boot_ms = next(float(line.split()[1]) for line in result.stdout.splitlines() if line.startswith('boot_ms'))
+        total_imports = sum(module['self'] for module in modules)
+        self.stdout.write(f'Загрузка: {boot_ms:.1f} мс, из них импорт: {total_imports:.1f} мс, модулей: {len(modules)}')
+
+        packages = defaultdict(float)
+        for module in modules:
+            packages[module['name'].split('.')[0]] += module['self']
+        self.stdout.write('\nПакеты (собственное время):')
+        for package, duration in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:options['limit']]:
+            self.stdout.write(f'  {duration:8.1f} мс  {package}')
+
+        if options['prefix']:
+            modules = [module for module in modules if module['name'].startswith(options['prefix'])]
+        for title, key in (('Модули (с зависимостями):', 'cumulative'), ('Модули (собственное время):', 'self')):
+            self.stdout.write(f'\n{title}')
+            for module in sorted(modules, key=lambda module: module[key], reverse=True)[:options['limit']]:
+                self.stdout.write(f"  {module[key]:8.1f} мс  {module['name']}")
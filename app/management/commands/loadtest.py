@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from app.loadtest import LoadGenerator, LoadTestError, load_log, replay_arrivals, synthetic_arrivals
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер: воспроизводит журнал запросов (JSONL) или синтетическую '
+            'смесь маршрутов и выводит пропускную способность, перцентили задержки и ошибки по маршрутам в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--log', default=None,
+                            help='JSONL с полями method, path, body, auth, offset; без него — синтетическая смесь')
+        parser.add_argument('--rate', type=float, default=None,
+                            help='Запросов в секунду (пуассоновский поток); для журнала по умолчанию — записанные интервалы')
+        parser.add_argument('--speed', type=float, default=1.0, help='Ускорение записанных интервалов журнала')
+        parser.add_argument('--duration', type=float, default=None, help='Секунд; для синтетики по умолчанию 30')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--username', default=None)
+        parser.add_argument('--password', default=None)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', default=None, help='Файл для отчета (по умолчанию stdout)')
+        parser.add_argument('--baseline', default=None, help='Отчет прошлого прогона для сравнения')
+
+    def handle(self, *args, **options):
+        if options['rate'] is not None and options['rate'] <= 0:
+            raise CommandError('--rate должен быть больше нуля')
+
+        try:
+            report = asyncio.run(self.run(options))
+        except LoadTestError as e:
+            raise CommandError(str(e))
+
+        data = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(data + '\n')
+        else:
+            self.stdout.write(data)
+
+        if options['baseline']:
+            self.compare(report, options['baseline'])
+
+    async def run(self, options):
+        generator = LoadGenerator(options['url'], options['concurrency'], options['timeout'],
+                                  options['username'], options['password'], options['seed'])
+        started = timezone.now()
+
+        if options['log']:
+            arrivals = replay_arrivals(generator, load_log(options['log']), options['rate'],
+                                       options['speed'], options['duration'])
+        else:
+            await generator.discover()
+            arrivals = synthetic_arrivals(generator, options['rate'] or 20, options['duration'] or 30)
+
+        duration = await generator.run(arrivals)
+        return {
+            'started': started.isoformat(),
+            'url': options['url'],
+            'source': options['log'] or 'synthetic',
+            'rate': options['rate'],
+            'concurrency': options['concurrency'],
+            'duration_s': round(duration, 3),
+            **generator.stats.report(duration),
+        }
+
+    def compare(self, report, path):
+        with open(path, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+        self.stderr.write(f"{'маршрут':<55} {'rps':>16} {'p95, мс':>20} {'ошибки':>16}")
+        for route, current in [('*', report['total']), *report['routes'].items()]:
+            previous = baseline['total'] if route == '*' else baseline['routes'].get(route)
+            if previous is None:
+                continue
+            self.stderr.write(
+                f"{route:<55} {previous['throughput']:>7} → {current['throughput']:<7} "
+                f"{previous['latency_ms']['p95']:>9} → {current['latency_ms']['p95']:<9} "
+                f"{previous['error_rate']:>7} → {current['error_rate']:<7}"
+            )
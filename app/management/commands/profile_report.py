@@ -0,0 +1,53 @@
+import glob
+import os
+import pstats
+
+from django.core.management.base import BaseCommand
+
+from app.profiling import get_config, issue_token
+
+
+SORT_KEYS = {'tottime': 2, 'cumtime': 3}
+
+
+class Command(BaseCommand):
+    help = 'Сводит сохраненные профили в отчет о самых горячих функциях по каждому маршруту'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='По умолчанию PROFILING["DIR"]')
+        parser.add_argument('--limit', type=int, default=15)
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='tottime')
+        parser.add_argument('--token', action='store_true', help='Выдать токен для заголовка отладки и выйти')
+
+    def handle(self, *args, **options):
+        config = get_config()
+        if options['token']:
+            self.stdout.write(f"{config['HEADER']}: {issue_token()}")
+            return
+
+        directory = options['dir'] or config['DIR']
+        reports = []
+        for route_dir in sorted(glob.glob(os.path.join(directory, '*'))):
+            files = glob.glob(os.path.join(route_dir, '*.prof'))
+            if not files:
+                continue
+            stats = pstats.Stats(*files)
+            route = route_dir
+            route_file = os.path.join(route_dir, 'route.txt')
+            if os.path.exists(route_file):
+                with open(route_file, encoding='utf-8') as f:
+                    route = f.read()
+            reports.append((stats.total_tt, route, len(files), stats))
+
+        if not reports:
+            self.stdout.write('Профилей не найдено')
+            return
+
+        sort_index = SORT_KEYS[options['sort']]
+        for total, route, samples, stats in sorted(reports, key=lambda report: report[0], reverse=True):
+            self.stdout.write(f'\n{route}  запросов: {samples}  всего: {total:.3f} с  в среднем: {total / samples * 1000:.1f} мс')
+            self.stdout.write(f"{'вызовов':>10} {'tottime':>10} {'cumtime':>10}  функция")
+
+            rows = sorted(stats.stats.items(), key=lambda item: item[1][sort_index], reverse=True)
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in rows[:options['limit']]:
+                self.stdout.write(f'{calls:>10} {tottime:>10.4f} {cumtime:>10.4f}  {name} ({filename}:{line})')
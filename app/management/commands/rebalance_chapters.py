@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from app.models import Book
+from app.ordering import rebalance_book, smallest_gap
+
+
+class Command(BaseCommand):
+    help = 'Перенумеровывает позиции глав в книгах, где промежутки между главами почти исчерпаны'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-gap', type=int, default=8)
+        parser.add_argument('--book', type=int, action='append', dest='book_ids')
+
+    def handle(self, *args, **options):
+        books = Book.objects.filter(chapters__isnull=False).distinct()
+        if options['book_ids']:
+            books = books.filter(id__in=options['book_ids'])
+
+        rebalanced = 0
+        for book_id in books.values_list('id', flat=True).iterator():
+            gap = smallest_gap(book_id)
+            if gap is not None and gap < options['min_gap']:
+                rebalance_book(book_id)
+                rebalanced += 1
+
+        self.stdout.write(f'Перенумеровано книг: {rebalanced}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.cards import rebuild_cards
+
+
+class Command(BaseCommand):
+    help = 'Полностью перестраивает карточки книг каталога'
+
+    def handle(self, *args, **options):
+        count = rebuild_cards()
+        self.stdout.write(f'Карточек: {count}')
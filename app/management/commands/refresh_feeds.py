@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app.feeds import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Полностью перестраивает ленты лучших, популярных и новых книг'
+
+    def handle(self, *args, **options):
+        count = rebuild_feeds()
+        self.stdout.write(f'Записей в лентах: {count}')
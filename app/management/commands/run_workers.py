@@ -0,0 +1,64 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from app import jobs
+
+
+STALE_CHECK_INTERVAL = 60
+
+
+def work(stop, poll_interval, burst):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_id = jobs.worker_id()
+    last_stale_check = 0
+
+    while not stop.is_set():
+        close_old_connections()
+
+        if time.monotonic() - last_stale_check > STALE_CHECK_INTERVAL:
+            jobs.requeue_stale()
+            last_stale_check = time.monotonic()
+
+        job = jobs.claim_next(worker_id)
+        if job is None:
+            if burst:
+                return
+            stop.wait(poll_interval)
+            continue
+
+        jobs.execute(job)
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркеры фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--burst', action='store_true', help='Завершиться, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        # Соединения с БД не должны наследоваться дочерними процессами
+        connections.close_all()
+
+        stop = multiprocessing.Event()
+        workers = [
+            multiprocessing.Process(target=work, args=(stop, options['poll_interval'], options['burst']), daemon=True)
+            for _ in range(options['processes'])
+        ]
+        for process in workers:
+            process.start()
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        self.stdout.write(f'Запущено воркеров: {len(workers)}')
+        for process in workers:
+            process.join()
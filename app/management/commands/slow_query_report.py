@@ -0,0 +1,48 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.slowqueries import get_config
+
+
+class Command(BaseCommand):
+    help = 'Показывает самые тяжелые запросы из журнала медленных запросов (по суммарному времени)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None, help='По умолчанию SLOW_QUERY_LOG["PATH"]')
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--plans', action='store_true', help='Показать последний план каждого запроса')
+
+    def handle(self, *args, **options):
+        path = options['path'] or get_config()['PATH']
+        if not os.path.exists(path):
+            raise CommandError(f'Журнал не найден: {path}')
+
+        groups = {}
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                group = groups.setdefault(entry['fingerprint'], {
+                    'count': 0, 'total': 0.0, 'max': 0.0, 'views': set(), 'sql': entry['normalized'], 'plan': None,
+                })
+                group['count'] += 1
+                group['total'] += entry['duration_ms']
+                group['max'] = max(group['max'], entry['duration_ms'])
+                group['views'].add(entry.get('view') or entry.get('route') or '?')
+                group['plan'] = entry.get('plan') or group['plan']
+
+        ranked = sorted(groups.items(), key=lambda item: item[1]['total'], reverse=True)
+        for fingerprint, group in ranked[:options['limit']]:
+            self.stdout.write(
+                f"\n{fingerprint}  всего: {group['total']:.1f} мс  раз: {group['count']}  "
+                f"среднее: {group['total'] / group['count']:.1f} мс  максимум: {group['max']:.1f} мс"
+            )
+            self.stdout.write(f"  представления: {', '.join(sorted(group['views']))}")
+            self.stdout.write(f"  {group['sql']}")
+            if options['plans'] and group['plan']:
+                for row in group['plan']:
+                    self.stdout.write(f'    {row}')
@@ -0,0 +1,296 @@
+import fcntl
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse, HttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_INTERVAL = 1.0
+
+HELP = {
+    'http_request_duration_seconds': ('histogram', 'Время обработки запроса'),
+    'db_queries_total': ('counter', 'Число SQL-запросов'),
+    'db_query_seconds_total': ('counter', 'Суммарное время SQL-запросов'),
+    'cache_requests_total': ('counter', 'Обращения к кэшу'),
+    'upload_bytes_total': ('counter', 'Объем загруженных данных'),
+    'jwt_authentication_seconds': ('histogram', 'Время проверки JWT'),
+    'jwt_refresh_seconds': ('histogram', 'Время обновления JWT'),
+    'auth_hash_seconds': ('histogram', 'Время хэширования пароля'),
+    'auth_hash_rejected_total': ('counter', 'Отказы из-за переполненного пула хэширования'),
+    'requests_throttled_total': ('counter', 'Запросы, отклоненные ограничением частоты'),
+    'requests_shed_total': ('counter', 'Запросы, отклоненные при перегрузке'),
+}
+
+
+# --- Метрики процесса ---
+# Каждый процесс периодически сбрасывает свои значения в отдельный файл
+# METRICS_DIR, а /metrics суммирует файлы всех воркеров.
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.last_flush = 0.0
+
+    def inc(self, name, labels, value=1.0):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] += value
+        self.maybe_flush()
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.setdefault(key, [[0] * (len(BUCKETS) + 1), 0.0, 0])
+            histogram[0][bisect_left(BUCKETS, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+        self.maybe_flush()
+
+    def dump(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), *histogram] for (name, labels), histogram in self.histograms.items()],
+            }
+
+    def maybe_flush(self, force=False):
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.last_flush < FLUSH_INTERVAL:
+                return
+            self.last_flush = now
+
+        # Метрики не должны ронять запрос, в котором их записывают
+        try:
+            write_snapshot(os.path.join(directory, f'metrics-{os.getpid()}.json'), self.dump())
+        except OSError:
+            logger.exception('Failed to flush metrics to %s', directory)
+
+
+def write_snapshot(path, snapshot):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # Уникальный временный файл: параллельные сбросы не мешают друг другу
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+registry = Registry()
+
+
+def observe_cache(cache_name, hit):
+    registry.inc('cache_requests_total', {'cache': cache_name, 'result': 'hit' if hit else 'miss'})
+
+
+# --- Сбор значений всех процессов ---
+ARCHIVE_NAME = 'metrics-archive.json'
+
+
+def read_snapshot(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def merge(snapshots):
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            merged = histograms.setdefault((name, tuple(map(tuple, labels))), [[0] * len(buckets), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+    return counters, histograms
+
+
+def snapshot_pid(path):
+    try:
+        return int(os.path.basename(path)[len('metrics-'):-len('.json')])
+    except ValueError:
+        return None
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Файлы завершившихся воркеров сливаются в архив и удаляются: счетчики
+# не убывают, а каталог не растет с каждым перезапуском воркеров
+def archive_dead(directory):
+    paths = [path for path in glob.glob(os.path.join(directory, 'metrics-*.json'))
+             if snapshot_pid(path) is not None and not process_alive(snapshot_pid(path))]
+    if not paths:
+        return
+
+    with open(os.path.join(directory, 'metrics-archive.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        archive_path = os.path.join(directory, ARCHIVE_NAME)
+        # Другой процесс мог успеть заархивировать эти файлы, пока мы ждали блокировку
+        dead = [(path, read_snapshot(path)) for path in paths if os.path.exists(path)]
+        if not dead:
+            return
+        archive = read_snapshot(archive_path)
+        counters, histograms = merge([snapshot for snapshot in [archive, *(s for _, s in dead)] if snapshot])
+        write_snapshot(archive_path, {
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, list(labels), *histogram] for (name, labels), histogram in histograms.items()],
+        })
+        for path, _ in dead:
+            os.remove(path)
+
+
+def collect():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return merge([registry.dump()])
+
+    registry.maybe_flush(force=True)
+    try:
+        archive_dead(directory)
+    except OSError:
+        logger.exception('Failed to archive metrics of finished workers in %s', directory)
+    snapshots = (read_snapshot(path) for path in glob.glob(os.path.join(directory, 'metrics-*.json')))
+    return merge([snapshot for snapshot in snapshots if snapshot])
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in pairs) + '}'
+
+
+def render():
+    counters, histograms = collect()
+    lines = []
+    described = set()
+
+    def describe(name):
+        if name not in described and name in HELP:
+            kind, text = HELP[name]
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+            described.add(name)
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name)
+        lines.append(f'{name}{format_labels(labels)} {value}')
+
+    for (name, labels), (buckets, total, count) in sorted(histograms.items()):
+        describe(name)
+        cumulative = 0
+        for bound, bucket in zip([*BUCKETS, '+Inf'], buckets):
+            cumulative += bucket
+            lines.append(f'{name}_bucket{format_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{name}_sum{format_labels(labels)} {total}')
+        lines.append(f'{name}_count{format_labels(labels)} {count}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# --- Сбор метрик запросов и SQL ---
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+
+        # Тело потокового ответа (пакетные выдачи, ?stream=1) строится уже после
+        # возврата из представления: замер завершается, когда тело отдано.
+        # Файлы и асинхронные потоки (SSE) не оборачиваем.
+        if response.streaming and not response.is_async and not isinstance(response, FileResponse):
+            response.streaming_content = self.timed_stream(response.streaming_content, request, response,
+                                                           timer, start)
+        else:
+            self.record(request, response, timer, start)
+        return response
+
+    def timed_stream(self, content, request, response, timer, start):
+        try:
+            with connection.execute_wrapper(timer):
+                yield from content
+        finally:
+            self.record(request, response, timer, start)
+
+    def record(self, request, response, timer, start):
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        route = match.route if match else 'unmatched'
+        registry.observe('http_request_duration_seconds', {
+            'route': route, 'method': request.method, 'status': str(response.status_code),
+        }, duration)
+        registry.inc('db_queries_total', {'route': route}, timer.count)
+        registry.inc('db_query_seconds_total', {'route': route}, timer.duration)
+
+        if request.content_type == 'multipart/form-data':
+            registry.inc('upload_bytes_total', {'route': route}, int(request.META.get('CONTENT_LENGTH') or 0))
+
+
+# --- JWT-аутентификация с замером времени ---
+class TimedJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        start = time.perf_counter()
+        try:
+            return super().authenticate(request)
+        finally:
+            registry.observe('jwt_authentication_seconds', {}, time.perf_counter() - start)
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:59
+
+from django.db import migrations, models
+
+
+CHAPTER_POSITION_GAP = 1024
+
+
+def fill_positions(apps, schema_editor):
+    Chapter = apps.get_model('app', 'Chapter')
+    chapters = list(Chapter.objects.order_by('book_id', 'order', 'id'))
+
+    index = {}
+    for chapter in chapters:
+        index[chapter.book_id] = index.get(chapter.book_id, 0) + 1
+        chapter.position = index[chapter.book_id] * CHAPTER_POSITION_GAP
+
+    Chapter.objects.bulk_update(chapters, ['position'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_book_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='position',
+            field=models.BigIntegerField(default=1024),
+        ),
+        migrations.RunPython(fill_positions, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='chapter',
+            unique_together={('book', 'position')},
+        ),
+        migrations.AlterModelOptions(
+            name='chapter',
+            options={'ordering': ['position']},
+        ),
+        migrations.RemoveField(
+            model_name='chapter',
+            name='order',
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:00
+
+import math
+import re
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+WORDS_PER_MINUTE = 200
+SECONDS_PER_IMAGE = 12
+
+
+def estimate_reading_time(word_count, image_count):
+    return math.ceil((word_count * 60 / WORDS_PER_MINUTE + image_count * SECONDS_PER_IMAGE) / 60)
+
+
+def fill_stats(apps, schema_editor):
+    Book = apps.get_model('app', 'Book')
+    Chapter = apps.get_model('app', 'Chapter')
+    word_re = re.compile(r'\w+')
+
+    for chapter in Chapter.objects.annotate(images_total=Count('images')).iterator(chunk_size=200):
+        chapter.word_count = len(word_re.findall(chapter.content))
+        chapter.char_count = len(chapter.content)
+        chapter.image_count = chapter.images_total
+        chapter.reading_time = estimate_reading_time(chapter.word_count, chapter.image_count)
+        chapter.save(update_fields=['word_count', 'char_count', 'image_count', 'reading_time'])
+
+    for book in Book.objects.annotate(
+        chapters_total=Count('chapters'),
+        words=Sum('chapters__word_count'),
+        chars=Sum('chapters__char_count'),
+        images=Sum('chapters__image_count'),
+    ).iterator(chunk_size=200):
+        Book.objects.filter(pk=book.pk).update(
+            chapter_count=book.chapters_total,
+            word_count=book.words or 0,
+            char_count=book.chars or 0,
+            image_count=book.images or 0,
+            reading_time=estimate_reading_time(book.words or 0, book.images or 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_chapter_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='chapter_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='char_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='char_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
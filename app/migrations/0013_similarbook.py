@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_reading_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='similar_stale',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.CreateModel(
+            name='SimilarBook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_books', to='app.book')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.book')),
+            ],
+            options={
+                'ordering': ['rank'],
+                'indexes': [models.Index(fields=['book', 'rank'], name='app_similar_book_id_649fbf_idx')],
+                'unique_together': {('book', 'similar')},
+            },
+        ),
+    ]
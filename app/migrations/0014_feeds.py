@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_ratings(apps, schema_editor):
+    Book = apps.get_model('app', 'Book')
+    for book in Book.objects.annotate(count=Count('comments'), total=Sum('comments__rating')).iterator(chunk_size=200):
+        Book.objects.filter(pk=book.pk).update(rating_count=book.count, rating_sum=book.total or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_similarbook'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feed', models.CharField(choices=[('top', 'лучшие'), ('trending', 'популярные'), ('new', 'новые')], max_length=10)),
+                ('score', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='app.book')),
+                ('genre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.genre')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['feed', 'genre', '-score'], name='app_feedent_feed_d25727_idx')],
+            },
+        ),
+        migrations.RunPython(fill_ratings, migrations.RunPython.noop),
+    ]
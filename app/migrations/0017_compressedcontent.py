@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:09
+
+import gzip
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def compress_chapters(apps, schema_editor):
+    Chapter = apps.get_model('app', 'Chapter')
+    CompressedContent = apps.get_model('app', 'CompressedContent')
+
+    for chapter in Chapter.objects.only('id', 'content').iterator(chunk_size=200):
+        data = chapter.content.encode('utf-8')
+        CompressedContent.objects.create(
+            chapter_id=chapter.id,
+            encoding='gzip',
+            data=gzip.compress(data, compresslevel=9, mtime=0),
+            size=len(data),
+            etag=hashlib.sha1(data).hexdigest(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_book_is_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompressedContent',
+            fields=[
+                ('chapter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='compressed', serialize=False, to='app.chapter')),
+                ('encoding', models.CharField(default='gzip', max_length=10)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField()),
+                ('etag', models.CharField(max_length=40)),
+            ],
+        ),
+        migrations.RunPython(compress_chapters, migrations.RunPython.noop),
+    ]
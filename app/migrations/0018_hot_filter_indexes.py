@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_compressedcontent'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_visible', 'created_at'], name='app_book_is_visi_eb3f36_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author', 'is_visible'], name='app_book_author__b7cd0f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['book', 'created_at'], name='app_comment_book_id_5816eb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='genre',
+            index=models.Index(fields=['is_active'], name='app_genre_is_acti_9e9ac3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'first_name'], name='app_user_role_96ca55_idx'),
+        ),
+    ]
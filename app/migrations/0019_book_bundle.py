@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='bundle',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
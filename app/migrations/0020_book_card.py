@@ -0,0 +1,69 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+CARD_FIELDS = ('title', 'description', 'cover', 'created_at', 'rating_count', 'rating_sum',
+               'chapter_count', 'word_count', 'char_count', 'image_count', 'reading_time')
+
+
+def fill_cards(apps, schema_editor):
+    Book = apps.get_model('app', 'Book')
+    BookCard = apps.get_model('app', 'BookCard')
+    books = Book.objects.filter(is_visible=True, is_deleted=False).select_related('author').prefetch_related('genres')
+
+    cards = []
+    for book in books.iterator(chunk_size=500):
+        genres = sorted(book.genres.all(), key=lambda genre: genre.id)
+        cards.append(BookCard(
+            book_id=book.id,
+            author_id=book.author_id,
+            author_first_name=book.author.first_name,
+            author_last_name=book.author.last_name,
+            author_surname=book.author.surname,
+            genre_ids=',' + ','.join(str(genre.id) for genre in genres) + ',' if genres else '',
+            genres=[{'id': genre.id, 'name': genre.name} for genre in genres],
+            average_rating=book.rating_sum / book.rating_count if book.rating_count else None,
+            **{field: getattr(book, field) for field in CARD_FIELDS},
+        ))
+    BookCard.objects.bulk_create(cards, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0019_book_bundle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookCard',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='app.book')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('cover', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField()),
+                ('author_first_name', models.CharField(max_length=150)),
+                ('author_last_name', models.CharField(max_length=150)),
+                ('author_surname', models.CharField(blank=True, max_length=150)),
+                ('genre_ids', models.CharField(blank=True, max_length=255)),
+                ('genres', models.JSONField(default=list)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('average_rating', models.FloatField(null=True)),
+                ('chapter_count', models.PositiveIntegerField(default=0)),
+                ('word_count', models.PositiveIntegerField(default=0)),
+                ('char_count', models.PositiveIntegerField(default=0)),
+                ('image_count', models.PositiveIntegerField(default=0)),
+                ('reading_time', models.PositiveIntegerField(default=0)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='app_bookcar_created_191fef_idx'), models.Index(fields=['author', 'created_at'], name='app_bookcar_author__f72b3f_idx'), models.Index(fields=['average_rating'], name='app_bookcar_average_ded24f_idx')],
+            },
+        ),
+        migrations.RunPython(fill_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_book_card'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapterimage',
+            name='is_pending',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_chapterimage_is_pending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+    ]
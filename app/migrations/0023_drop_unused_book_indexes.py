@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:47
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0022_chapter_is_deleted'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='book',
+            name='app_book_is_visi_eb3f36_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='app_book_author__b7cd0f_idx',
+        ),
+    ]
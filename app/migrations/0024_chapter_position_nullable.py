@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:55
+
+from django.db import migrations, models
+
+
+def release_deleted_positions(apps, schema_editor):
+    Chapter = apps.get_model('app', 'Chapter')
+    Chapter.objects.filter(is_deleted=True).update(position=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_drop_unused_book_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='chapter',
+            name='position',
+            field=models.BigIntegerField(default=1024, null=True),
+        ),
+        migrations.RunPython(release_deleted_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0024_chapter_position_nullable'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bookcard',
+            name='genre_ids',
+            field=models.TextField(blank=True),
+        ),
+    ]
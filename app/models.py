@@ -1,8 +1,15 @@
+import gzip
+import hashlib
+import math
 import os
+import re
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Window
+from django.db.models.functions import RowNumber
 from django.forms import ValidationError
 from django.conf import settings
+from django.utils import timezone
 
 
 # --- Пользователь  ---
@@ -21,6 +28,9 @@ class User(AbstractUser):
 
     REQUIRED_FIELDS = ['email']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [models.Index(fields=['role', 'first_name'])]
+
     def __str__(self):
         return f"{self.get_full_name()} ({self.role})"
 
@@ -32,10 +42,24 @@ class Genre(models.Model):
     
     is_active = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['is_active'])]
+
     def __str__(self):
         return self.name
 
 
+# --- Статистика чтения ---
+WORDS_PER_MINUTE = 200
+SECONDS_PER_IMAGE = 12
+WORD_RE = re.compile(r'\w+')
+
+
+def estimate_reading_time(word_count, image_count):
+    seconds = word_count * 60 / WORDS_PER_MINUTE + image_count * SECONDS_PER_IMAGE
+    return math.ceil(seconds / 60)
+
+
 # --- Книга ---
 class Book(models.Model):
     title = models.CharField(max_length=255)
@@ -48,10 +72,60 @@ class Book(models.Model):
 
     is_visible = models.BooleanField(default=True)
     hidden_comment = models.TextField(blank=True)
+    # Книга удаляется в фоне: скрыта сразу, строки и файлы удаляются пачками
+    is_deleted = models.BooleanField(default=False)
+
+    chapter_count = models.PositiveIntegerField(default=0)
+    word_count = models.PositiveIntegerField(default=0)
+    char_count = models.PositiveIntegerField(default=0)
+    image_count = models.PositiveIntegerField(default=0)
+    reading_time = models.PositiveIntegerField(default=0)
+
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    similar_stale = models.BooleanField(default=True)
+
+    # Архив для чтения без сети: путь содержит хэш содержимого
+    bundle = models.CharField(max_length=255, blank=True)
 
     def __str__(self):
         return self.title
 
+    def refresh_rating(self):
+        totals = self.comments.aggregate(count=Count('id'), total=Sum('rating'))
+        self.rating_count = totals['count']
+        self.rating_sum = totals['total'] or 0
+        Book.objects.filter(pk=self.pk).update(rating_count=self.rating_count, rating_sum=self.rating_sum)
+        BookCard.objects.filter(pk=self.pk).update(
+            rating_count=self.rating_count,
+            rating_sum=self.rating_sum,
+            average_rating=self.rating_sum / self.rating_count if self.rating_count else None,
+        )
+
+    def refresh_stats(self):
+        totals = self.chapters.filter(is_deleted=False).aggregate(
+            chapters=Count('id'),
+            words=Sum('word_count'),
+            chars=Sum('char_count'),
+            images=Sum('image_count'),
+        )
+        self.chapter_count = totals['chapters']
+        self.word_count = totals['words'] or 0
+        self.char_count = totals['chars'] or 0
+        self.image_count = totals['images'] or 0
+        self.reading_time = estimate_reading_time(self.word_count, self.image_count)
+
+        stats = {
+            'chapter_count': self.chapter_count,
+            'word_count': self.word_count,
+            'char_count': self.char_count,
+            'image_count': self.image_count,
+            'reading_time': self.reading_time,
+        }
+        Book.objects.filter(pk=self.pk).update(**stats)
+        BookCard.objects.filter(pk=self.pk).update(**stats)
+
     def clean(self):
         super().clean()
         if not self.genres.exists():
@@ -59,20 +133,86 @@ class Book(models.Model):
             raise ValidationError("У книги должен быть хотя бы один жанр.")
 
 
+# --- Шаг между позициями соседних глав ---
+CHAPTER_POSITION_GAP = 1024
+
+
 # --- Глава ---
+class ChapterQuerySet(models.QuerySet):
+    def with_order(self):
+        # Сквозной номер главы (1, 2, 3...) из разреженной позиции — один проход
+        # по главам книги. В выборке должны быть все главы книги (оглавление, архив):
+        # фильтр по отдельным главам сузил бы нумерацию до них
+        return self.annotate(order=Window(RowNumber(), partition_by=[F('book')], order_by=F('position').asc()))
+
+    def with_order_lookup(self):
+        # Для отдельных глав (одна глава, пакет из разных книг): номер — число
+        # предшествующих глав, подсчитанное по индексу (book, position)
+        preceding = Chapter.objects.filter(book=OuterRef('book'), position__lte=OuterRef('position'), is_deleted=False) \
+                                   .order_by() \
+                                   .values('book') \
+                                   .annotate(count=Count('id')) \
+                                   .values('count')
+        return self.annotate(order=Subquery(preceding))
+
+    def for_toc(self):
+        # Оглавлению хватает предрассчитанной статистики, текст главы не читаем
+        return self.filter(is_deleted=False).defer('content').with_order()
+
+
 class Chapter(models.Model):
     book = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='chapters')
     title = models.CharField(max_length=255)
     content = models.TextField()
-    order = models.PositiveIntegerField(default=1)
+    # NULL у удаленной главы: она уже вне порядка глав и не занимает позицию
+    position = models.BigIntegerField(default=CHAPTER_POSITION_GAP, null=True)
+
+    word_count = models.PositiveIntegerField(default=0)
+    char_count = models.PositiveIntegerField(default=0)
+    image_count = models.PositiveIntegerField(default=0)
+    reading_time = models.PositiveIntegerField(default=0)
+    # Глава ждет фоновой очистки
+    is_deleted = models.BooleanField(default=False)
+
+    objects = ChapterQuerySet.as_manager()
 
     class Meta:
-        unique_together = ('book', 'order')
-        ordering = ['order']
+        unique_together = ('book', 'position')
+        ordering = ['position']
 
     def __str__(self):
         return f"{self.book.title} - {self.title}"
 
+    def compress_content(self):
+        data = self.content.encode('utf-8')
+        compressed, _ = CompressedContent.objects.update_or_create(chapter=self, defaults={
+            'encoding': 'gzip',
+            'data': gzip.compress(data, compresslevel=9, mtime=0),
+            'size': len(data),
+            'etag': hashlib.sha1(data).hexdigest(),
+        })
+        return compressed
+
+    def refresh_stats(self):
+        self.word_count = len(WORD_RE.findall(self.content))
+        self.char_count = len(self.content)
+        self.image_count = self.images.count()
+        self.reading_time = estimate_reading_time(self.word_count, self.image_count)
+        self.save(update_fields=['word_count', 'char_count', 'image_count', 'reading_time'])
+        self.book.refresh_stats()
+
+
+# --- Сжатый текст главы (готов к отдаче клиентам с Accept-Encoding: gzip) ---
+class CompressedContent(models.Model):
+    chapter = models.OneToOneField(Chapter, on_delete=models.CASCADE, primary_key=True, related_name='compressed')
+    encoding = models.CharField(max_length=10, default='gzip')
+    data = models.BinaryField()
+    size = models.PositiveIntegerField()
+    etag = models.CharField(max_length=40)
+
+    def __str__(self):
+        return f"{self.chapter_id}: {len(self.data)}/{self.size} ({self.encoding})"
+
 
 # --- Путь до изображений ---
 def chapter_image_upload_path(instance, filename):
@@ -85,6 +225,8 @@ class ChapterImage(models.Model):
     image = models.ImageField(upload_to=chapter_image_upload_path)
     caption = models.CharField(max_length=255, blank=True)
     order = models.PositiveIntegerField(default=1)
+    # Файл еще переносится фоновой задачей store_chapter_images
+    is_pending = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['order']
@@ -103,6 +245,7 @@ class Comment(models.Model):
 
     class Meta:
         unique_together = ('user', 'book')
+        indexes = [models.Index(fields=['book', 'created_at'])]
 
     def clean(self):
         if not self.content:
@@ -114,3 +257,111 @@ class Comment(models.Model):
 
     def __str__(self):
         return f"Комментарий от {self.user} к книге '{self.book}' с оценкой {self.rating}"
+
+
+# --- Похожие книги (рассчитываются офлайн) ---
+class SimilarBook(models.Model):
+    book = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='similar_books')
+    similar = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('book', 'similar')
+        ordering = ['rank']
+        indexes = [models.Index(fields=['book', 'rank'])]
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.similar_id} ({self.score:.3f})"
+
+
+# --- Предрассчитанные ленты (лучшие, популярные, новые) ---
+class FeedEntry(models.Model):
+    FEED_CHOICES = (
+        ('top', 'лучшие'),
+        ('trending', 'популярные'),
+        ('new', 'новые'),
+    )
+    feed = models.CharField(max_length=10, choices=FEED_CHOICES)
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    book = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='feed_entries')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [models.Index(fields=['feed', 'genre', '-score'])]
+
+    def __str__(self):
+        return f"{self.feed}/{self.genre_id or '*'}: {self.book_id} ({self.score:.3f})"
+
+
+# --- Карточка книги для каталога (денормализованная копия, только видимые книги) ---
+class BookCard(models.Model):
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    title = models.CharField(max_length=255)
+    description = models.TextField()
+    cover = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField()
+
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    author_first_name = models.CharField(max_length=150)
+    author_last_name = models.CharField(max_length=150)
+    author_surname = models.CharField(max_length=150, blank=True)
+
+    # Идентификаторы в виде ",1,5,": фильтр по жанру — поиск подстроки ",5,".
+    # Длина строки растет с числом жанров, поэтому без ограничения
+    genre_ids = models.TextField(blank=True)
+    genres = models.JSONField(default=list)
+
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    average_rating = models.FloatField(null=True)
+
+    chapter_count = models.PositiveIntegerField(default=0)
+    word_count = models.PositiveIntegerField(default=0)
+    char_count = models.PositiveIntegerField(default=0)
+    image_count = models.PositiveIntegerField(default=0)
+    reading_time = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['author', 'created_at']),
+            models.Index(fields=['average_rating']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.book_id})"
+
+
+# --- Фоновая задача ---
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'в очереди'),
+        ('running', 'выполняется'),
+        ('done', 'выполнена'),
+        ('failed', 'ошибка'),
+    )
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    priority = models.SmallIntegerField(default=0)
+    # Ключ занят только пока задача ждет в очереди, чтобы не ставить дубликаты
+    dedup_key = models.CharField(max_length=255, null=True, blank=True, unique=True)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    progress = models.JSONField(default=dict, blank=True)
+    last_error = models.TextField(blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', '-priority', 'run_at'])]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models import F, Max
+
+from .models import Book, Chapter, CHAPTER_POSITION_GAP
+from .tasks import schedule_rebalance
+
+
+# При меньшем промежутке между соседями перенумеровываем главы в фоне
+REBALANCE_THRESHOLD = 8
+
+
+# --- Блокировка книги на время изменения порядка глав ---
+def lock_book(book_id):
+    return Book.objects.select_for_update().only('id').get(pk=book_id)
+
+
+# --- Добавление главы в конец книги ---
+def append_chapter(book, **fields):
+    with transaction.atomic():
+        lock_book(book.id)
+        last_position = Chapter.objects.filter(book=book, is_deleted=False).aggregate(Max('position'))['position__max'] or 0
+        return Chapter.objects.create(book=book, position=last_position + CHAPTER_POSITION_GAP, **fields)
+
+
+# --- Перемещение главы на место с номером order (с единицы) ---
+def move_chapter(chapter, order):
+    with transaction.atomic():
+        lock_book(chapter.book_id)
+        position = _free_position(chapter, order)
+
+        if position is None:
+            rebalance_book(chapter.book_id)
+            chapter.refresh_from_db(fields=['position'])
+            position = _free_position(chapter, order)
+
+        if position != chapter.position:
+            chapter.position = position
+            chapter.save(update_fields=['position'])
+
+        if _needs_rebalance(chapter):
+            schedule_rebalance(chapter.book_id)
+
+    return chapter
+
+
+def _free_position(chapter, order):
+    siblings = Chapter.objects.filter(book_id=chapter.book_id, is_deleted=False).exclude(pk=chapter.pk).order_by('position')
+    index = max(order, 1) - 1
+    neighbours = list(siblings.values_list('position', flat=True)[max(index - 1, 0):index + 1])
+
+    if index > 0 and not neighbours:
+        # Номер больше числа глав — ставим главу в конец
+        neighbours = list(siblings.reverse().values_list('position', flat=True)[:1])
+
+    if index == 0:
+        before, after = None, neighbours[0] if neighbours else None
+    elif len(neighbours) == 2:
+        before, after = neighbours
+    else:
+        before, after = neighbours[-1] if neighbours else None, None
+
+    if before is None and after is None:
+        return chapter.position
+    if after is None:
+        return before + CHAPTER_POSITION_GAP
+    if before is None:
+        before = 0
+    if after - before < 2:
+        return None
+    return (before + after) // 2
+
+
+def _needs_rebalance(chapter):
+    siblings = Chapter.objects.filter(book_id=chapter.book_id, is_deleted=False).values_list('position', flat=True)
+    before = siblings.filter(position__lt=chapter.position).order_by('-position').first()
+    after = siblings.filter(position__gt=chapter.position).order_by('position').first()
+    gaps = [chapter.position - (before or 0)]
+    if after is not None:
+        gaps.append(after - chapter.position)
+    return min(gaps) < REBALANCE_THRESHOLD
+
+
+# --- Равномерная перенумерация позиций глав книги ---
+def rebalance_book(book_id):
+    with transaction.atomic():
+        lock_book(book_id)
+        chapters = Chapter.objects.filter(book_id=book_id, is_deleted=False)
+
+        # Сначала уводим позиции в отрицательные значения, чтобы не нарушить уникальность
+        chapters.update(position=-F('position'))
+        ids = list(chapters.order_by('-position').values_list('id', flat=True))
+
+        for index, chapter_id in enumerate(ids, start=1):
+            Chapter.objects.filter(pk=chapter_id).update(position=index * CHAPTER_POSITION_GAP)
+
+
+# --- Минимальный промежуток между соседними главами книги ---
+def smallest_gap(book_id):
+    positions = list(Chapter.objects.filter(book_id=book_id, is_deleted=False)
+                                    .order_by('position')
+                                    .values_list('position', flat=True))
+    gaps = [b - a for a, b in zip([0] + positions, positions)]
+    return min(gaps) if gaps else None
@@ -0,0 +1,93 @@
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+
+
+TOKEN_SALT = 'app.profiling'
+TOKEN_MAX_AGE = 24 * 3600
+
+DEFAULTS = {
+    'ENABLED': False,
+    # Доля запросов, которые профилируются без заголовка
+    'SAMPLE_RATE': 0.0,
+    'DIR': os.path.join(settings.BASE_DIR, 'profiles'),
+    'HEADER': 'X-Debug-Profile',
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+# --- Подписанный токен для заголовка отладки ---
+def issue_token():
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def is_valid_token(token):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def route_key(route):
+    return re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+
+
+# --- Профилирование выборки запросов ---
+class SamplingProfilerMiddleware:
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.sample_rate = config['SAMPLE_RATE']
+        self.directory = config['DIR']
+        self.header = 'HTTP_' + config['HEADER'].upper().replace('-', '_')
+        # cProfile может работать только в одном потоке за раз
+        self.lock = threading.Lock()
+
+    def should_profile(self, request):
+        token = request.META.get(self.header)
+        if token:
+            return is_valid_token(token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request) or not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            self.dump(request, profiler)
+        finally:
+            self.lock.release()
+        return response
+
+    def dump(self, request, profiler):
+        match = request.resolver_match
+        route = match.route if match else request.path_info
+        directory = os.path.join(self.directory, route_key(route))
+        os.makedirs(directory, exist_ok=True)
+
+        route_file = os.path.join(directory, 'route.txt')
+        if not os.path.exists(route_file):
+            with open(route_file, 'w', encoding='utf-8') as f:
+                f.write(route)
+
+        profiler.dump_stats(os.path.join(directory, f'{time.time_ns()}-{os.getpid()}.prof'))
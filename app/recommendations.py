@@ -0,0 +1,120 @@
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Book, Comment, SimilarBook
+
+
+TOP_K = 10
+CONTENT_WEIGHT = 0.4
+
+
+# --- Разреженная матрица книга × жанр ---
+def load_genre_matrix():
+    book_genres = defaultdict(set)
+    genre_books = defaultdict(set)
+    for book_id, genre_id in Book.genres.through.objects.values_list('book_id', 'genre_id').iterator():
+        book_genres[book_id].add(genre_id)
+        genre_books[genre_id].add(book_id)
+    return book_genres, genre_books
+
+
+# --- Разреженная матрица пользователь × книга (оценки центрированы по пользователю) ---
+def load_rating_matrix():
+    user_ratings = defaultdict(dict)
+    for user_id, book_id, rating in Comment.objects.values_list('user_id', 'book_id', 'rating').iterator():
+        user_ratings[user_id][book_id] = rating
+
+    book_vectors = defaultdict(dict)
+    for user_id, ratings in user_ratings.items():
+        mean = sum(ratings.values()) / len(ratings)
+        for book_id, rating in ratings.items():
+            book_vectors[book_id][user_id] = rating - mean
+
+    norms = {book_id: math.sqrt(sum(v * v for v in vector.values())) for book_id, vector in book_vectors.items()}
+    return user_ratings, book_vectors, norms
+
+
+# --- Косинусная близость по жанрам ---
+def content_scores(book_id, book_genres, genre_books):
+    genres = book_genres.get(book_id)
+    if not genres:
+        return {}
+
+    overlap = defaultdict(int)
+    for genre_id in genres:
+        for other_id in genre_books[genre_id]:
+            overlap[other_id] += 1
+
+    return {
+        other_id: shared / math.sqrt(len(genres) * len(book_genres[other_id]))
+        for other_id, shared in overlap.items()
+    }
+
+
+# --- Косинусная близость по оценкам читателей (item-item) ---
+def collaborative_scores(book_id, user_ratings, book_vectors, norms):
+    norm = norms.get(book_id)
+    if not norm:
+        return {}
+
+    dots = defaultdict(float)
+    for user_id, weight in book_vectors[book_id].items():
+        for other_id in user_ratings[user_id]:
+            dots[other_id] += weight * book_vectors[other_id][user_id]
+
+    return {
+        other_id: dot / (norm * norms[other_id])
+        for other_id, dot in dots.items()
+        if norms.get(other_id)
+    }
+
+
+def top_similar(book_id, candidates, matrices, top_k):
+    book_genres, genre_books, user_ratings, book_vectors, norms = matrices
+    content = content_scores(book_id, book_genres, genre_books)
+    collaborative = collaborative_scores(book_id, user_ratings, book_vectors, norms)
+
+    scores = {}
+    for other_id in content.keys() | collaborative.keys():
+        if other_id == book_id or other_id not in candidates:
+            continue
+        score = CONTENT_WEIGHT * content.get(other_id, 0) + (1 - CONTENT_WEIGHT) * collaborative.get(other_id, 0)
+        if score > 0:
+            scores[other_id] = score
+
+    return heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+# --- Пересчет похожих книг ---
+def build_similar_books(full=False, top_k=TOP_K):
+    candidates = set(Book.objects.filter(is_visible=True).values_list('id', flat=True))
+
+    if full:
+        targets = set(Book.objects.values_list('id', flat=True))
+    else:
+        stale = set(Book.objects.filter(similar_stale=True).values_list('id', flat=True))
+        # Книги, в чьих списках есть изменившиеся, тоже нужно пересчитать
+        referring = SimilarBook.objects.filter(similar_id__in=stale).values_list('book_id', flat=True)
+        targets = stale | set(referring)
+
+    if not targets:
+        return 0
+
+    book_genres, genre_books = load_genre_matrix()
+    user_ratings, book_vectors, norms = load_rating_matrix()
+    matrices = (book_genres, genre_books, user_ratings, book_vectors, norms)
+
+    rows = []
+    for book_id in targets:
+        for rank, (other_id, score) in enumerate(top_similar(book_id, candidates, matrices, top_k), start=1):
+            rows.append(SimilarBook(book_id=book_id, similar_id=other_id, rank=rank, score=score))
+
+    with transaction.atomic():
+        SimilarBook.objects.filter(book_id__in=targets).delete()
+        SimilarBook.objects.bulk_create(rows, batch_size=1000)
+        Book.objects.filter(id__in=targets).update(similar_stale=False)
+
+    return len(targets)
@@ -6,7 +6,9 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.conf import settings
 from django.db.models import Avg
 import os
+from .compiled import CompiledModelSerializer
 from .models import *
+from .tasks import schedule_chapter_stats, schedule_cover
 
 
 User = get_user_model()
@@ -44,22 +46,13 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
     
     
-# Метод сохранения обложки книги
-def save_cover_file(book, cover_file):
-    book_dir = os.path.join(settings.BASE_DIR, 'static', 'books', str(book.id))
-    os.makedirs(book_dir, exist_ok=True)
-    cover_path = os.path.join(book_dir, 'cover.jpg')
-
-    with open(cover_path, 'wb') as f:
-        for chunk in cover_file.chunks():
-            f.write(chunk)
-
-    book.cover = f"/static/books/{book.id}/cover.jpg"
-    book.save()
+# Метод сохранения обложки книги (запись и обработка файла — в фоновой задаче)
+def save_cover_file(book, cover_file, user=None):
+    return schedule_cover(book, cover_file, user=user)
     
 
 # --- Все жанры --
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(CompiledModelSerializer):
     class Meta:
         model = Genre
         fields = ['id', 'name']
@@ -93,7 +86,7 @@ class BookCESerializer(serializers.ModelSerializer):
         )
 
         if cover_file:
-            save_cover_file(book, cover_file)
+            save_cover_file(book, cover_file, user=author)
 
         if genres:
             book.genres.set(genres)
@@ -111,66 +104,112 @@ class BookCESerializer(serializers.ModelSerializer):
             instance.genres.set(genres)
 
         if cover_file:
-            save_cover_file(instance, cover_file)
+            save_cover_file(instance, cover_file, user=self.context['request'].user)
 
-        instance.save()
+        # Только отредактированные поля: рейтинг, статистику и архив параллельно
+        # обновляют другие пути через update(), и полная запись вернула бы старые значения
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
         return instance
 
 
 # --- Расчет рейтинга книги ---
-def get_book_average_rating(book_id):
-    result = Comment.objects.filter(book_id=book_id).aggregate(avg_rating=Avg('rating'))
-    return result['avg_rating']
+def get_book_average_rating(book):
+    return book.rating_sum / book.rating_count if book.rating_count else None
 
 
 # --- Все писатели ---
-class WriterSerializer(serializers.ModelSerializer):
+class WriterSerializer(CompiledModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'first_name', 'last_name', 'surname']
 
 
 # --- Все/мои книги ---
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(CompiledModelSerializer):
     genres = GenreSerializer(many=True)
     author = WriterSerializer()
     average_rating = serializers.SerializerMethodField()
 
     class Meta:
         model = Book
-        fields = ['id', 'title', 'created_at', 'description', 'author', 'genres', 'cover', 'average_rating']
+        fields = ['id', 'title', 'created_at', 'description', 'author', 'genres', 'cover', 'average_rating',
+                  'chapter_count', 'word_count', 'char_count', 'image_count', 'reading_time']
         
     def get_average_rating(self, obj):
-        return get_book_average_rating(obj.id)
+        return get_book_average_rating(obj)
         
         
+# --- Книга в каталоге (из карточки, тот же формат, что и BookSerializer) ---
+class BookCardSerializer(CompiledModelSerializer):
+    id = serializers.IntegerField(source='book_id')
+    author = serializers.SerializerMethodField()
+    genres = serializers.JSONField()
+
+    class Meta:
+        model = BookCard
+        fields = ['id', 'title', 'created_at', 'description', 'author', 'genres', 'cover', 'average_rating',
+                  'chapter_count', 'word_count', 'char_count', 'image_count', 'reading_time']
+
+    def get_author(self, obj):
+        return {
+            'id': obj.author_id,
+            'first_name': obj.author_first_name,
+            'last_name': obj.author_last_name,
+            'surname': obj.author_surname,
+        }
+
+
+# --- Похожие книги ---
+class SimilarBookSerializer(CompiledModelSerializer):
+    id = serializers.IntegerField(source='similar.id')
+    title = serializers.CharField(source='similar.title')
+    cover = serializers.CharField(source='similar.cover')
+    author = WriterSerializer(source='similar.author')
+
+    class Meta:
+        model = SimilarBook
+        fields = ['id', 'title', 'cover', 'author', 'score']
+
+
 # --- Главы для деталей книги ---
-class ChapterSerializer(serializers.ModelSerializer):
+class ChapterSerializer(CompiledModelSerializer):
+    order = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Chapter
-        fields = ['id', 'title', 'order']
+        fields = ['id', 'title', 'order', 'word_count', 'char_count', 'image_count', 'reading_time']
 
 
 # --- Детали книги ---
-class BookDetailSerializer(serializers.ModelSerializer):
+class BookDetailSerializer(CompiledModelSerializer):
     author = serializers.StringRelatedField()
     genres = GenreSerializer(many=True)
     chapters = ChapterSerializer(many=True, read_only=True)
 
     class Meta:
         model = Book
-        fields = ['id', 'title', 'created_at', 'description', 'author', 'genres', 'cover', 'chapters']
+        fields = ['id', 'title', 'created_at', 'description', 'author', 'genres', 'cover', 'chapters',
+                  'chapter_count', 'word_count', 'char_count', 'image_count', 'reading_time', 'bundle']
     
 
 # --- Для изображений в главах (детали, редактирование) ---
-class ChapterImageSerializer(serializers.ModelSerializer):
+class ChapterImageSerializer(CompiledModelSerializer):
     class Meta:
         model = ChapterImage
-        fields = ['id', 'image', 'caption', 'order']
+        fields = ['id', 'image', 'caption', 'order', 'is_pending']
         extra_kwargs = {
-            'image': {'read_only': True}
+            'image': {'read_only': True},
+            'is_pending': {'read_only': True},
         }
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Файл еще не перенесен: ссылка вела бы на 404
+        if instance.is_pending:
+            data['image'] = None
+        return data
+
     def to_internal_value(self, data):
         return {
             'id': data.get('id'),
@@ -185,6 +224,11 @@ class ChapterUploadSerializer(serializers.Serializer):
     content = serializers.CharField()
 
 
+# --- Перемещение главы ---
+class ChapterMoveSerializer(serializers.Serializer):
+    order = serializers.IntegerField(min_value=1)
+
+
 # --- Редактирование главы ---
 class ChapterUpdateSerializer(serializers.ModelSerializer):
     images = ChapterImageSerializer(many=True)
@@ -195,8 +239,12 @@ class ChapterUpdateSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         instance.title = validated_data.get('title', instance.title)
+        content_changed = 'content' in validated_data and validated_data['content'] != instance.content
         instance.content = validated_data.get('content', instance.content)
-        instance.save()
+        instance.save(update_fields=['title', 'content'])
+
+        if content_changed:
+            instance.compress_content()
 
         images_data = validated_data.get('images', [])
 
@@ -206,24 +254,61 @@ class ChapterUpdateSerializer(serializers.ModelSerializer):
                 chapter_image = ChapterImage.objects.get(id=image_id, chapter=instance)
                 chapter_image.caption = img_data.get('caption', chapter_image.caption)
                 chapter_image.order = img_data.get('order', chapter_image.order)
-                chapter_image.save()
+                chapter_image.save(update_fields=['caption', 'order'])
             except ChapterImage.DoesNotExist:
                 continue
 
+        if content_changed:
+            schedule_chapter_stats(instance)
+
         return instance
 
 
 # --- Детали главы ---
-class ChapterDetailSerializer(serializers.ModelSerializer):
+class ChapterDetailSerializer(CompiledModelSerializer):
     images = ChapterImageSerializer(many=True, read_only=True)
+    order = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Chapter
         fields = ['id', 'title', 'content', 'order', 'images']
 
 
+# --- Заголовок книги для режима чтения ---
+class ReaderBookSerializer(serializers.ModelSerializer):
+    author = serializers.StringRelatedField()
+
+    class Meta:
+        model = Book
+        fields = ['id', 'title', 'author', 'cover']
+
+
+# --- Сводка по книге для панели писателя ---
+class WriterDashboardBookSerializer(serializers.ModelSerializer):
+    review_count = serializers.IntegerField(source='rating_count')
+    average_rating = serializers.SerializerMethodField()
+    last_review_at = serializers.DateTimeField()
+
+    class Meta:
+        model = Book
+        fields = ['id', 'title', 'cover', 'created_at', 'is_visible', 'hidden_comment',
+                  'chapter_count', 'word_count', 'reading_time',
+                  'review_count', 'average_rating', 'last_review_at']
+
+    def get_average_rating(self, obj):
+        return get_book_average_rating(obj)
+
+
+# --- Статус фоновой задачи ---
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'name', 'status', 'attempts', 'max_attempts', 'progress', 'last_error',
+                  'created_at', 'run_at', 'finished_at']
+
+
 # --- Просмотр комментария ---
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(CompiledModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
 
     class Meta:
@@ -0,0 +1,169 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import autocomplete, cards, events
+from .feeds import update_book_feeds
+from .models import Book, Chapter, ChapterImage, Comment, Genre, User
+from .serializers import CommentSerializer, get_book_average_rating
+from .tasks import schedule_bundle
+
+
+# --- Изменились оценки или жанры: похожие книги нужно пересчитать ---
+@receiver([post_save, post_delete], sender=Comment)
+def mark_similar_stale_on_comment(sender, instance, **kwargs):
+    Book.objects.filter(pk=instance.book_id, similar_stale=False, is_deleted=False).update(similar_stale=True)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def mark_similar_stale_on_genres(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Book):
+        Book.objects.filter(pk=instance.pk, similar_stale=False).update(similar_stale=True)
+
+
+# --- Рейтинг книги и ленты ---
+@receiver(post_save, sender=Comment)
+def update_rating_on_comment_save(sender, instance, created, **kwargs):
+    book = Book.objects.filter(pk=instance.book_id).first()
+    if book is None:
+        return
+    book.refresh_rating()
+    update_book_feeds(book.id, commented_at=instance.created_at if created else None)
+    publish_rating(book)
+
+
+@receiver(post_delete, sender=Comment)
+def update_rating_on_comment_delete(sender, instance, **kwargs):
+    # Удаляемую книгу пересчитывать незачем
+    book = Book.objects.filter(pk=instance.book_id, is_deleted=False).first()
+    if book is None:
+        return
+    book.refresh_rating()
+    update_book_feeds(book.id, uncommented_at=instance.created_at)
+    publish_rating(book)
+
+
+@receiver(post_save, sender=Book)
+def update_feeds_on_book_save(sender, instance, **kwargs):
+    update_book_feeds(instance.id)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def update_feeds_on_genres(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Book):
+        update_book_feeds(instance.id)
+
+
+# --- События книги для подписчиков ---
+def publish_rating(book):
+    events.publish(book.id, 'rating', {
+        'average_rating': get_book_average_rating(book),
+        'rating_count': book.rating_count,
+    })
+
+
+@receiver(post_save, sender=Comment)
+def publish_new_comment(sender, instance, created, **kwargs):
+    if created:
+        events.publish(instance.book_id, 'comment', CommentSerializer(instance).data)
+
+
+@receiver(post_save, sender=Chapter)
+def publish_new_chapter(sender, instance, created, **kwargs):
+    if created:
+        order = Chapter.objects.filter(book_id=instance.book_id, position__lte=instance.position, is_deleted=False).count()
+        events.publish(instance.book_id, 'chapter', {'id': instance.id, 'title': instance.title, 'order': order})
+
+
+# --- Архив для чтения без сети пересобирается после правок глав и изображений ---
+@receiver([post_save, post_delete], sender=Chapter)
+def schedule_bundle_on_chapter(sender, instance, **kwargs):
+    if Book.objects.filter(pk=instance.book_id, is_deleted=False).exists():
+        schedule_bundle(instance.book_id)
+
+
+@receiver([post_save, post_delete], sender=ChapterImage)
+def schedule_bundle_on_image(sender, instance, **kwargs):
+    book_id = Book.objects.filter(chapters=instance.chapter_id, is_deleted=False).values_list('id', flat=True).first()
+    if book_id is not None:
+        schedule_bundle(book_id)
+
+
+# --- Карточки каталога ---
+@receiver(post_save, sender=Book)
+def refresh_card_on_book_save(sender, instance, **kwargs):
+    cards.refresh_book_card(instance.id)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def refresh_card_on_genres(sender, instance, action, pk_set=None, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Book):
+        cards.refresh_book_card(instance.id)
+    else:
+        # Изменение со стороны жанра: genre.books.add(...)
+        cards.refresh_cards(pk_set or cards.genre_card_ids(instance.id))
+
+
+@receiver(post_save, sender=User)
+def update_cards_on_user_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login', 'password'}:
+        return
+    cards.update_author_cards(instance)
+
+
+@receiver([post_save, post_delete], sender=Genre)
+def refresh_cards_on_genre_change(sender, instance, **kwargs):
+    cards.refresh_cards(cards.genre_card_ids(instance.id))
+
+
+# --- Индекс автодополнения ---
+@receiver(post_save, sender=Book)
+def update_autocomplete_on_book_save(sender, instance, **kwargs):
+    index = autocomplete.loaded_index()
+    if index is None:
+        return
+    if instance.is_visible:
+        index.add('book', instance.id, instance.title, instance.rating_count)
+    else:
+        index.remove('book', instance.id)
+
+    author = instance.author
+    if author.role == 'writer':
+        index.add('writer', author.id, autocomplete.writer_label(author))
+
+
+@receiver(post_delete, sender=Book)
+def update_autocomplete_on_book_delete(sender, instance, **kwargs):
+    index = autocomplete.loaded_index()
+    if index is not None:
+        index.remove('book', instance.id)
+
+
+@receiver(post_save, sender=User)
+def update_autocomplete_on_user_save(sender, instance, update_fields=None, **kwargs):
+    index = autocomplete.loaded_index()
+    if index is None or (update_fields and set(update_fields) <= {'last_login', 'password'}):
+        return
+    if instance.role == 'writer' and Book.objects.filter(author=instance).exists():
+        index.add('writer', instance.id, autocomplete.writer_label(instance))
+    else:
+        index.remove('writer', instance.id)
+
+
+@receiver(post_save, sender=Genre)
+def update_autocomplete_on_genre_save(sender, instance, **kwargs):
+    index = autocomplete.loaded_index()
+    if index is None:
+        return
+    if instance.is_active:
+        index.add('genre', instance.id, instance.name)
+    else:
+        index.remove('genre', instance.id)
+
+
+@receiver(post_delete, sender=Genre)
+def update_autocomplete_on_genre_delete(sender, instance, **kwargs):
+    index = autocomplete.loaded_index()
+    if index is not None:
+        index.remove('genre', instance.id)
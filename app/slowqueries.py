@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'THRESHOLD_MS': 200,
+    'PATH': os.path.join(settings.BASE_DIR, 'logs', 'slow_queries.jsonl'),
+    'EXPLAIN': True,
+    # EXPLAIN ANALYZE повторно выполняет запрос; поддерживается только в PostgreSQL
+    'ANALYZE': False,
+}
+
+_write_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'SLOW_QUERY_LOG', {})}
+
+
+# --- Отпечаток запроса: SQL без конкретных значений ---
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_RE = re.compile(r'%s|\?')
+IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = PLACEHOLDER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('(...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize_sql(sql).encode()).hexdigest()[:16]
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view = getattr(match.func, 'view_class', match.func)
+    return f'{view.__module__}.{view.__qualname__}'
+
+
+def explain(sql, params, analyze):
+    options = {'analyze': True} if analyze and connection.vendor == 'postgresql' else {}
+    prefix = connection.ops.explain_query_prefix(**options)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        return [' '.join(str(column) for column in row) for row in cursor.fetchall()]
+
+
+def write_entry(path, entry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    line = json.dumps(entry, ensure_ascii=False, default=str)
+    with _write_lock, open(path, 'a', encoding='utf-8') as f:
+        f.write(line + '\n')
+
+
+# --- Перехватчик запросов соединения ---
+class SlowQueryRecorder:
+    def __init__(self, request, config):
+        self.request = request
+        self.config = config
+        self.threshold = config['THRESHOLD_MS'] / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'busy', False):
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - start
+
+        if duration >= self.threshold:
+            _local.busy = True
+            try:
+                self.record(sql, params, many, duration)
+            finally:
+                _local.busy = False
+        return result
+
+    def record(self, sql, params, many, duration):
+        plan = None
+        if self.config['EXPLAIN'] and not many and sql.lstrip().upper().startswith('SELECT'):
+            try:
+                plan = explain(sql, params, self.config['ANALYZE'])
+            except Exception as e:
+                plan = [f'EXPLAIN failed: {e}']
+
+        match = getattr(self.request, 'resolver_match', None)
+        entry = {
+            'time': timezone.now().isoformat(),
+            'view': view_name(self.request),
+            'route': match.route if match else self.request.path_info,
+            'duration_ms': round(duration * 1000, 3),
+            'fingerprint': fingerprint(sql),
+            'normalized': normalize_sql(sql),
+            'sql': sql,
+            'params': None if many else list(params or ()),
+            'vendor': connection.vendor,
+            'plan': plan,
+        }
+        logger.warning('Slow query %.1f ms in %s: %s', entry['duration_ms'], entry['view'], entry['normalized'])
+        write_entry(self.config['PATH'], entry)
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        self.config = get_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with connection.execute_wrapper(SlowQueryRecorder(request, self.config)):
+            return self.get_response(request)
@@ -0,0 +1,96 @@
+import json
+from collections.abc import Iterator
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# --- Разбиение последовательности на пачки ---
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --- Потоковый ответ и под WSGI, и под ASGI ---
+# Синхронный итератор StreamingHttpResponse под ASGI Django сначала вычитывает
+# целиком (sync_to_async(list)), и память уже ничем не ограничена. Здесь под ASGI
+# части забираются по одной в том же потоке, где работало представление: там его
+# соединение с базой и курсор queryset.iterator().
+_DONE = object()
+
+
+class SyncStreamingHttpResponse(StreamingHttpResponse):
+    async def __aiter__(self):
+        if self.is_async:
+            async for part in super().__aiter__():
+                yield part
+            return
+
+        parts = self.streaming_content
+        while True:
+            part = await sync_to_async(next, thread_sensitive=True)(parts, _DONE)
+            if part is _DONE:
+                return
+            yield part
+
+
+# --- Потоковая сериализация JSON-массива ---
+# Элементы копятся в буфер, чтобы не писать в сокет по одному маленькому куску
+STREAM_BUFFER_SIZE = 16 * 1024
+
+
+def iter_json_array(items):
+    parts, size = ['['], 1
+    separator = ''
+    for item in items:
+        part = separator + json.dumps(item, cls=JSONEncoder, ensure_ascii=False)
+        parts.append(part)
+        size += len(part)
+        separator = ','
+        if size >= STREAM_BUFFER_SIZE:
+            yield ''.join(parts)
+            parts, size = [], 0
+    parts.append(']')
+    yield ''.join(parts)
+
+
+def json_array_response(items, status=200):
+    return SyncStreamingHttpResponse(iter_json_array(items), status=status, content_type='application/json')
+
+
+# --- Потоковая сериализация JSON-объекта ---
+# Значения-итераторы выводятся как потоковые массивы, остальные — целиком
+def iter_json_object(fields):
+    yield '{'
+    separator = ''
+    for key, value in fields.items():
+        yield separator + json.dumps(key) + ':'
+        if isinstance(value, Iterator):
+            yield from iter_json_array(value)
+        else:
+            yield json.dumps(value, cls=JSONEncoder, ensure_ascii=False)
+        separator = ','
+    yield '}'
+
+
+def json_object_response(fields, status=200):
+    return SyncStreamingHttpResponse(iter_json_object(fields), status=status, content_type='application/json')
+
+
+# --- Потоковая выдача queryset: в памяти не больше одной пачки строк ---
+STREAM_CHUNK_SIZE = 500
+
+
+def serialize_stream(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE):
+    for chunk in chunked(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        yield from serializer_class(chunk, many=True).data
+
+
+def wants_stream(request):
+    return request.query_params.get('stream') in ('1', 'true')
@@ -0,0 +1,228 @@
+import os
+import shutil
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from .cards import refresh_book_card
+from .jobs import enqueue, failure_handler, heartbeat, job_handler, report_progress
+from .models import Book, Chapter, ChapterImage, Comment
+
+
+PURGE_BATCH_SIZE = 500
+
+
+# --- Пути к файлам книг ---
+def book_dir(book_id):
+    return os.path.join(settings.BASE_DIR, 'static', 'books', str(book_id))
+
+
+def chapter_dir(book_id, chapter_id):
+    return os.path.join(book_dir(book_id), 'chapters', str(chapter_id))
+
+
+def static_path(relative_url):
+    return os.path.join(settings.BASE_DIR, relative_url.lstrip('/'))
+
+
+# --- Быстрое сохранение загруженного файла во временный каталог ---
+def stage_upload(uploaded_file):
+    os.makedirs(settings.UPLOAD_STAGING_DIR, exist_ok=True)
+    staged = os.path.join(settings.UPLOAD_STAGING_DIR, uuid.uuid4().hex)
+
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        # Большие загрузки уже лежат на диске — достаточно переместить
+        shutil.move(uploaded_file.temporary_file_path(), staged)
+    else:
+        with open(staged, 'wb') as f:
+            for chunk in uploaded_file.chunks():
+                f.write(chunk)
+    return staged
+
+
+def move_staged(staged, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if os.path.exists(staged):
+        shutil.move(staged, destination)
+    elif not os.path.exists(destination):
+        raise FileNotFoundError(staged)
+
+
+def remove_staged(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# --- Обложка книги ---
+def schedule_cover(book, uploaded_file, user=None):
+    staged = stage_upload(uploaded_file)
+    return enqueue('store_cover', {'book_id': book.id, 'staged': staged}, priority=5, user=user)
+
+
+@job_handler('store_cover')
+def store_cover(job):
+    from PIL import Image
+
+    book_id = job.payload['book_id']
+    staged = job.payload['staged']
+    if not Book.objects.filter(pk=book_id).exists():
+        remove_staged(staged)
+        return
+
+    cover_path = os.path.join(book_dir(book_id), 'cover.jpg')
+    os.makedirs(book_dir(book_id), exist_ok=True)
+    if os.path.exists(staged):
+        with Image.open(staged) as image:
+            image.convert('RGB').save(cover_path, 'JPEG', quality=90)
+        os.remove(staged)
+
+    # update() не вызывает post_save, поэтому карточку каталога обновляем сами
+    with transaction.atomic():
+        Book.objects.filter(pk=book_id).update(cover=f"/static/books/{book_id}/cover.jpg")
+        refresh_book_card(book_id)
+
+
+@failure_handler('store_cover')
+def discard_cover(job):
+    remove_staged(job.payload['staged'])
+
+
+# --- Изображения глав ---
+# Строки изображений создаются сразу с is_pending=True и показываются без ссылки
+# на файл, пока задача его не перенесет
+def schedule_chapter_images(chapter, files, user=None):
+    staged = [{'staged': stage_upload(uploaded_file), 'path': path} for uploaded_file, path in files]
+    return enqueue('store_chapter_images', {'chapter_id': chapter.id, 'files': staged}, priority=5, user=user)
+
+
+@job_handler('store_chapter_images')
+def store_chapter_images(job):
+    for item in job.payload['files']:
+        move_staged(item['staged'], static_path(item['path']))
+
+    paths = [item['path'] for item in job.payload['files']]
+    ChapterImage.objects.filter(chapter_id=job.payload['chapter_id'], image__in=paths).update(is_pending=False)
+
+    chapter = Chapter.objects.filter(pk=job.payload['chapter_id']).only('book_id').first()
+    if chapter is not None:
+        schedule_bundle(chapter.book_id)
+
+
+@failure_handler('store_chapter_images')
+def discard_chapter_images(job):
+    # Файлов уже не будет: убираем их копии и строки, которые их ждали
+    remove_staged(*(item['staged'] for item in job.payload['files']))
+    paths = [item['path'] for item in job.payload['files']]
+    ChapterImage.objects.filter(chapter_id=job.payload['chapter_id'], image__in=paths, is_pending=True).delete()
+
+
+# --- Статистика чтения ---
+def schedule_chapter_stats(chapter):
+    return enqueue('refresh_chapter_stats', {'chapter_id': chapter.id}, dedup_key=f'chapter-stats:{chapter.id}')
+
+
+@job_handler('refresh_chapter_stats')
+def refresh_chapter_stats(job):
+    chapter = Chapter.objects.select_related('book').filter(pk=job.payload['chapter_id']).first()
+    if chapter is not None:
+        chapter.refresh_stats()
+
+
+# --- Перенумерация глав ---
+def schedule_rebalance(book_id):
+    return enqueue('rebalance_chapters', {'book_id': book_id}, priority=-5, dedup_key=f'rebalance:{book_id}')
+
+
+@job_handler('rebalance_chapters')
+def rebalance_chapters(job):
+    from .ordering import rebalance_book
+
+    if Book.objects.filter(pk=job.payload['book_id']).exists():
+        rebalance_book(job.payload['book_id'])
+
+
+# --- Архив книги для чтения без сети ---
+# Правки приходят пачками (глава, затем ее изображения), поэтому сборка
+# откладывается и повторные постановки схлопываются по dedup_key
+BUNDLE_DELAY = timedelta(seconds=30)
+
+
+def schedule_bundle(book_id, delay=BUNDLE_DELAY):
+    return enqueue('build_bundle', {'book_id': book_id}, priority=-5, dedup_key=f'bundle:{book_id}', delay=delay)
+
+
+@job_handler('build_bundle')
+def build_bundle(job):
+    from .bundles import build_bundle
+
+    build_bundle(job.payload['book_id'])
+
+
+# --- Удаление пачками, каждая пачка в своей короткой транзакции ---
+def delete_in_batches(queryset, batch_size=PURGE_BATCH_SIZE, on_batch=None):
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            queryset.model.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        if on_batch:
+            on_batch(deleted)
+
+
+# --- Удаление книги: скрываем сразу, дочерние строки и файлы удаляем в фоне ---
+def schedule_book_purge(book, user=None):
+    book.is_visible = False
+    book.is_deleted = True
+    book.save(update_fields=['is_visible', 'is_deleted'])
+    return enqueue('purge_book', {'book_id': book.id}, dedup_key=f'purge-book:{book.id}', user=user)
+
+
+@job_handler('purge_book')
+def purge_book(job):
+    book_id = job.payload['book_id']
+    stages = [
+        ('comments', Comment.objects.filter(book_id=book_id)),
+        ('images', ChapterImage.objects.filter(chapter__book_id=book_id)),
+        ('chapters', Chapter.objects.filter(book_id=book_id)),
+    ]
+    totals = {stage: queryset.count() for stage, queryset in stages}
+    report_progress(job, totals=totals, deleted={stage: 0 for stage in totals}, stage='rows')
+
+    for stage, queryset in stages:
+        def on_batch(deleted, stage=stage):
+            report_progress(job, deleted={**job.progress['deleted'], stage: deleted})
+        delete_in_batches(queryset, on_batch=on_batch)
+
+    report_progress(job, stage='files')
+    shutil.rmtree(book_dir(book_id), ignore_errors=True)
+
+    Book.objects.filter(pk=book_id, is_deleted=True).delete()
+    report_progress(job, stage='done')
+
+
+# --- Удаление главы ---
+# Глава сразу скрывается, строки и файлы удаляются в фоне
+def schedule_chapter_purge(chapter, user=None):
+    chapter.is_deleted = True
+    chapter.position = None
+    chapter.save(update_fields=['is_deleted', 'position'])
+    return enqueue('purge_chapter', {'chapter_id': chapter.id}, dedup_key=f'purge-chapter:{chapter.id}', user=user)
+
+
+@job_handler('purge_chapter')
+def purge_chapter(job):
+    chapter = Chapter.objects.select_related('book').filter(pk=job.payload['chapter_id'], is_deleted=True).first()
+    if chapter is None:
+        return
+
+    delete_in_batches(ChapterImage.objects.filter(chapter=chapter), on_batch=lambda deleted: heartbeat(job))
+    book = chapter.book
+    chapter.delete()
+    book.refresh_stats()
+    shutil.rmtree(chapter_dir(book.id, job.payload['chapter_id']), ignore_errors=True)
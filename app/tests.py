@@ -1,3 +1,1031 @@
-from django.test import TestCase
+import io
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import Throttled
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import autocomplete, bundles, events, hashing, metrics, throttling
+from .feeds import TRENDING_WINDOW, rebuild_feeds
+from .models import CHAPTER_POSITION_GAP, Book, BookCard, Chapter, ChapterImage, Comment, FeedEntry, Genre, Job, SimilarBook, User
+from .ordering import append_chapter, move_chapter, rebalance_book, smallest_gap
+from .recommendations import build_similar_books
+from .jobs import claim_next, enqueue, execute, job_handler, report_progress, requeue_stale
+from .tasks import schedule_chapter_purge, schedule_cover
+from .serializers import BookCESerializer
+from .streaming import json_array_response
+from .views import BookCommentsListView, BookListView, GenreListView, WriterListView
+
+
+# SQLite не использует индекс для условия вида WHERE "is_visible" (так Django
+# записывает фильтр по булеву полю), PostgreSQL использует
+postgresql_only = skipUnless(connection.vendor == 'postgresql', 'Индекс по булеву полю использует только PostgreSQL')
+
+# Ограничение частоты проверяется отдельно; в остальных тестах оно мешает
+no_throttling = override_settings(THROTTLING={'ENABLED': False})
+
+
+def create_writer(username='writer'):
+    return User.objects.create_user(username=username, email=f'{username}@example.com', password='pw',
+                                    first_name='Анна', last_name='Ли', role='writer')
+
+
+# Каталог с файлами книг и загрузками во временной папке
+class FilesTestCase(TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir, ignore_errors=True)
+        settings_override = override_settings(BASE_DIR=self.base_dir, UPLOAD_STAGING_DIR=f'{self.base_dir}/staging')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+def image_upload(name='cover.png'):
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(output, 'PNG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/png')
+
+
+# --- Планы запросов горячих фильтров ---
+# Проверяем, что запросы представлений используют составные индексы,
+# иначе после изменения фильтров или индексов план незаметно деградирует.
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.writer = User.objects.create_user(username='writer', email='writer@example.com', password='pw',
+                                              first_name='Анна', last_name='Ли', role='writer')
+        cls.reader = User.objects.create_user(username='reader', email='reader@example.com', password='pw',
+                                              first_name='Борис', last_name='Рой')
+        cls.genre = Genre.objects.create(name='История')
+        cls.book = Book.objects.create(title='Глубокое время', description='...', author=cls.writer)
+        cls.book.genres.set([cls.genre])
+        Comment.objects.create(user=cls.reader, book=cls.book, content='Хорошо', rating=5)
+
+    def build_queryset(self, view_class, path, **kwargs):
+        request = APIRequestFactory().get(path)
+        view = view_class()
+        view.setup(request, **kwargs)
+        view.request = view.initialize_request(request)
+        return view.get_queryset()
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            # На маленькой тестовой таблице планировщик всегда выберет полный просмотр
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, model, fields):
+        index = next(index for index in model._meta.indexes if index.fields == fields)
+        plan = self.explain(queryset)
+        self.assertIn(index.name, plan, f'Индекс {index.name} не используется:\n{plan}')
+
+    def test_book_list_uses_card_date_index(self):
+        queryset = self.build_queryset(BookListView, '/api/books/?sort_field=date&sort_direction=desc')
+        self.assertUsesIndex(queryset, BookCard, ['created_at'])
+
+    def test_book_list_by_author_uses_card_author_index(self):
+        queryset = self.build_queryset(BookListView, f'/api/books/?author={self.writer.id}')
+        self.assertUsesIndex(queryset, BookCard, ['author', 'created_at'])
+
+    def test_writer_list_uses_role_name_index(self):
+        queryset = self.build_queryset(WriterListView, '/api/writers/')
+        self.assertUsesIndex(queryset, User, ['role', 'first_name'])
+
+    @postgresql_only
+    def test_genre_list_uses_active_index(self):
+        queryset = self.build_queryset(GenreListView, '/api/genres/')
+        self.assertUsesIndex(queryset, Genre, ['is_active'])
+
+    def test_book_comments_use_book_date_index(self):
+        queryset = self.build_queryset(BookCommentsListView, f'/api/books/{self.book.id}/comments/', id=self.book.id)
+        self.assertUsesIndex(queryset, Comment, ['book', 'created_at'])
+
+
+# --- Обложка попадает в карточку каталога ---
+@no_throttling
+class CoverJobTests(FilesTestCase):
+    def test_catalog_shows_cover_after_job(self):
+        book = Book.objects.create(title='Книга', description='...', author=create_writer())
+        self.assertEqual(BookCard.objects.get(pk=book.pk).cover, '')
+
+        with self.settings(JOBS_RUN_INLINE=True), self.captureOnCommitCallbacks(execute=True):
+            schedule_cover(book, image_upload())
+
+        cover = f'/static/books/{book.id}/cover.jpg'
+        self.assertEqual(BookCard.objects.get(pk=book.pk).cover, cover)
+        response = APIClient().get('/api/books/')
+        self.assertEqual(response.json()[0]['cover'], cover)
+
+
+# --- Очередь задач ---
+@job_handler('test_fail')
+def failing_job(job):
+    raise RuntimeError('сбой')
+
+
+@job_handler('test_noop')
+def noop_job(job):
+    pass
+
+
+class JobQueueTests(FilesTestCase):
+    def test_claim_takes_due_jobs_by_priority(self):
+        low = enqueue('test_noop')
+        high = enqueue('test_noop', priority=5)
+        enqueue('test_noop', priority=10, delay=timedelta(minutes=5))
+
+        self.assertEqual(claim_next('w1').pk, high.pk)
+        self.assertEqual(claim_next('w2').pk, low.pk)
+        self.assertIsNone(claim_next('w3'))
+
+        job = Job.objects.get(pk=high.pk)
+        self.assertEqual((job.status, job.locked_by, job.attempts), ('running', 'w1', 1))
+
+    def test_dedup_until_claimed(self):
+        first = enqueue('test_noop', dedup_key='stats:1')
+        self.assertEqual(enqueue('test_noop', dedup_key='stats:1').pk, first.pk)
+
+        claim_next('w1')
+        self.assertNotEqual(enqueue('test_noop', dedup_key='stats:1').pk, first.pk)
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_failed_attempt_is_retried_with_backoff(self):
+        enqueue('test_fail', max_attempts=3)
+        job = claim_next('w1')
+        before = timezone.now()
+        self.assertFalse(execute(job))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.locked_by, '')
+        self.assertIn('RuntimeError', job.last_error)
+        # Первая задержка — 5 с с разбросом ±20%
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=4))
+        self.assertLessEqual(job.run_at, timezone.now() + timedelta(seconds=6))
+        self.assertIsNone(claim_next('w1'))
+
+    def test_last_attempt_fails_and_removes_staged_file(self):
+        book = Book.objects.create(title='Книга', description='...', author=create_writer())
+        staged = os.path.join(self.base_dir, 'broken')
+        with open(staged, 'wb') as f:
+            f.write(b'not an image')
+        enqueue('store_cover', {'book_id': book.id, 'staged': staged}, max_attempts=1)
+
+        self.assertFalse(execute(claim_next('w1')))
+
+        job = Job.objects.get(name='store_cover')
+        self.assertEqual(job.status, 'failed')
+        self.assertIsNotNone(job.finished_at)
+        self.assertFalse(os.path.exists(staged))
+
+    def test_stale_running_job_is_requeued(self):
+        enqueue('test_noop')
+        job = claim_next('w1')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(claim_next('w2').pk, job.pk)
+
+    def test_stale_job_out_of_attempts_fails(self):
+        book = Book.objects.create(title='Книга', description='...', author=create_writer())
+        staged = os.path.join(self.base_dir, 'staged')
+        open(staged, 'wb').close()
+        enqueue('store_cover', {'book_id': book.id, 'staged': staged}, max_attempts=1)
+        job = claim_next('w1')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertFalse(os.path.exists(staged))
+
+    def test_progress_keeps_long_job_locked(self):
+        enqueue('test_noop')
+        job = claim_next('w1')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        report_progress(job, stage='rows')
+        self.assertEqual(requeue_stale(), 0)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'running')
+
+
+# --- Изображения главы до переноса файлов ---
+@no_throttling
+class ChapterImageJobTests(FilesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.writer = create_writer()
+        self.book = Book.objects.create(title='Книга', description='...', author=self.writer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.writer)
+
+    def upload(self):
+        response = self.client.post(f'/api/books/{self.book.id}/chapter/upload/',
+                                    {'title': 'Глава', 'content': 'Текст', 'images': [image_upload('map.png')]},
+                                    format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def images(self, chapter_id):
+        return self.client.get(f'/api/books/{self.book.id}/chapter/{chapter_id}/').json()['images']
+
+    def test_image_url_hidden_until_job_stores_file(self):
+        created = self.upload()
+        [image] = self.images(created['id'])
+        self.assertIsNone(image['image'])
+        self.assertTrue(image['is_pending'])
+
+        self.assertTrue(execute(claim_next('w1')))
+
+        [image] = self.images(created['id'])
+        self.assertFalse(image['is_pending'])
+        self.assertTrue(image['image'].endswith('map.png'))
+        path = os.path.join(self.base_dir, 'static', 'books', str(self.book.id), 'chapters', str(created['id']), 'map.png')
+        self.assertTrue(os.path.exists(path))
+
+    def test_failed_job_drops_pending_images(self):
+        created = self.upload()
+        Job.objects.filter(pk=created['job_id']).update(max_attempts=1)
+        job = claim_next('w1')
+        staged = job.payload['files'][0]['staged']
+
+        with mock.patch('app.tasks.move_staged', side_effect=OSError('диск заполнен')):
+            self.assertFalse(execute(job))
+
+        self.assertFalse(os.path.exists(staged))
+        self.assertEqual(self.images(created['id']), [])
+
+
+# --- Редактирование книги не затирает счетчики ---
+class BookEditTests(TestCase):
+    def test_edit_keeps_counters_updated_meanwhile(self):
+        writer = create_writer()
+        book = Book.objects.create(title='Книга', description='...', author=writer)
+        # Пока форма редактирования открыта, приходят оценка и глава
+        Book.objects.filter(pk=book.pk).update(rating_count=1, rating_sum=5, chapter_count=3, word_count=900)
+
+        request = mock.Mock(user=writer)
+        serializer = BookCESerializer(book, data={'title': 'Новое название'}, partial=True, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        stored = Book.objects.get(pk=book.pk)
+        self.assertEqual((stored.title, stored.rating_count, stored.rating_sum, stored.chapter_count, stored.word_count),
+                         ('Новое название', 1, 5, 3, 900))
+        card = BookCard.objects.get(pk=book.pk)
+        self.assertEqual((card.title, card.rating_count, card.chapter_count), ('Новое название', 1, 3))
+
+
+# --- Карточка книги со множеством жанров ---
+@no_throttling
+class BookCardGenresTests(TestCase):
+    def test_many_genres_fit_and_filter(self):
+        genres = Genre.objects.bulk_create([Genre(name=f'Жанр {i}') for i in range(120)])
+        book = Book.objects.create(title='Книга', description='...', author=create_writer())
+        book.genres.set(genres)
+
+        self.assertGreater(len(BookCard.objects.get(pk=book.pk).genre_ids), 255)
+        response = APIClient().get('/api/books/', {'genre': genres[-1].id})
+        self.assertEqual([item['id'] for item in response.json()], [book.id])
+
+
+# --- Ограничение частоты ---
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'throttling': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttling'}},
+    THROTTLING={'SCOPES': {'default': {'anon': (1, 3), 'user': (1, 3)}}},
+)
+class ThrottleTests(TestCase):
+    def setUp(self):
+        caches['throttling'].clear()
+        throttling.fallback_cache.clear()
+        self.addCleanup(setattr, throttling, '_shared_down_until', 0)
+
+    def test_burst_over_capacity_is_rejected(self):
+        client = APIClient()
+        statuses = [client.get('/api/genres/').status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        response = client.get('/api/genres/')
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    def test_unavailable_cache_falls_back_to_process_counters(self):
+        client = APIClient()
+        with mock.patch.object(caches['throttling'], 'incr', side_effect=ConnectionError) as incr, \
+                self.assertLogs('app.throttling', 'WARNING') as logs:
+            statuses = [client.get('/api/genres/').status_code for _ in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+        # После сбоя общий кэш какое-то время не опрашивается
+        self.assertEqual((incr.call_count, len(logs.records)), (1, 1))
+
+    def test_forwarded_for_does_not_change_anonymous_identity(self):
+        client = APIClient()
+        statuses = [client.get('/api/genres/', HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code for i in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+
+# --- Пул хэширования паролей ---
+class HashingPoolTests(TestCase):
+    def block_worker(self, pool):
+        # Занимает единственный поток пула до конца теста
+        started, release = threading.Event(), threading.Event()
+        thread = threading.Thread(target=pool.run, args=(lambda: (started.set(), release.wait(5)),))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        started.wait(5)
+
+    def test_full_pool_rejects_immediately(self):
+        pool = hashing.HashingPool(workers=1, queue_size=0, queue_timeout=5)
+        self.block_worker(pool)
+        start = time.monotonic()
+        with self.assertRaises(Throttled) as raised:
+            pool.run(lambda: 'hash')
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertGreaterEqual(raised.exception.wait, 1)
+
+    def test_queued_hash_is_dropped_after_timeout(self):
+        pool = hashing.HashingPool(workers=1, queue_size=1, queue_timeout=0.05)
+        self.block_worker(pool)
+        called = []
+        with self.assertRaises(Throttled):
+            pool.run(called.append, 'hash')
+        self.assertEqual((called, pool.pending), ([], 1))
+
+    @no_throttling
+    def test_login_returns_429_when_pool_is_saturated(self):
+        User.objects.create_user(username='reader', email='reader@example.com', password='pw')
+        pool = hashing.HashingPool(workers=1, queue_size=0, queue_timeout=5)
+        self.block_worker(pool)
+        with mock.patch.object(hashing, '_pool', pool):
+            response = APIClient().post('/api/login/', {'username': 'reader', 'password': 'pw'}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+
+# --- События книги (SSE) ---
+class BookEventsTests(TestCase):
+    def broker(self, **config):
+        return events.InProcessBroker({**events.DEFAULTS, **config})
+
+    def read_stream(self, broker, last_event_id=None, publish=(), count=None):
+        async def read():
+            stream = events.event_stream(1, last_event_id)
+            parts = [await stream.__anext__()]
+            for event, data in publish:
+                broker.publish(1, event, data)
+            while count is None or len(parts) < count:
+                try:
+                    parts.append(await stream.__anext__())
+                except StopAsyncIteration:
+                    break
+            await stream.aclose()
+            return parts
+
+        with mock.patch('app.events.get_broker', return_value=broker):
+            return async_to_sync(read)()
+
+    def event_ids(self, parts):
+        return [int(part.split('\n')[0][len('id: '):]) for part in parts if part.startswith('id: ')]
+
+    def test_resume_sends_missed_events(self):
+        broker = self.broker()
+        for i in range(3):
+            broker.publish(1, 'comment', {'n': i})
+
+        parts = self.read_stream(broker, last_event_id=1, count=3)
+        self.assertTrue(parts[0].startswith('retry: '))
+        self.assertEqual(self.event_ids(parts), [2, 3])
+        self.assertIn('data: {"n": 2}', parts[2])
+
+    def test_reset_when_history_no_longer_covers_gap(self):
+        broker = self.broker(HISTORY_SIZE=2)
+        for i in range(5):
+            broker.publish(1, 'comment', {'n': i})
+
+        for last_event_id in (1, 9):
+            parts = self.read_stream(broker, last_event_id=last_event_id, count=2)
+            self.assertEqual(parts[1], 'event: reset\ndata: {}\n\n')
+
+        self.assertEqual(self.read_stream(broker, last_event_id=3, count=3)[1:], [m for _, m in broker.history[1]])
+
+    def test_slow_subscriber_is_disconnected_after_queue(self):
+        broker = self.broker(QUEUE_SIZE=2)
+        parts = self.read_stream(broker, publish=[('comment', {'n': i}) for i in range(5)])
+        # Две вместившиеся в очередь записи, затем поток закрывается
+        self.assertEqual(self.event_ids(parts), [1, 2])
+        self.assertEqual(broker.subscribers, {})
+
+
+# --- Метрики процессов ---
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_concurrent_flushes_do_not_fail(self):
+        errors = []
+
+        def flush():
+            try:
+                for _ in range(50):
+                    metrics.registry.maybe_flush(force=True)
+            except Exception as exc:
+                errors.append(exc)
+
+        with self.settings(METRICS_DIR=self.directory):
+            threads = [threading.Thread(target=flush) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(self.directory), [f'metrics-{os.getpid()}.json'])
+
+    def test_dead_worker_is_archived(self):
+        finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                  capture_output=True, text=True)
+        dead_path = os.path.join(self.directory, f'metrics-{finished.stdout.strip()}.json')
+        with open(dead_path, 'w', encoding='utf-8') as f:
+            json.dump({'counters': [['db_queries_total', [['route', 'dead/']], 7.0]], 'histograms': []}, f)
+
+        with self.settings(METRICS_DIR=self.directory):
+            counters, _ = metrics.collect()
+            self.assertFalse(os.path.exists(dead_path))
+            self.assertTrue(os.path.exists(os.path.join(self.directory, metrics.ARCHIVE_NAME)))
+            self.assertEqual(counters[('db_queries_total', (('route', 'dead/'),))], 7.0)
+            # Повторный сбор не считает архив дважды
+            counters, _ = metrics.collect()
+            self.assertEqual(counters[('db_queries_total', (('route', 'dead/'),))], 7.0)
+
+    @no_throttling
+    def test_streaming_response_queries_are_counted(self):
+        key = ('db_queries_total', (('route', 'api/books/'),))
+        before = metrics.registry.counters[key]
+        response = APIClient().get('/api/books/?stream=1')
+        self.assertEqual(metrics.registry.counters[key], before)
+        b''.join(response.streaming_content)
+        self.assertEqual(metrics.registry.counters[key], before + 1)
+
+
+# --- Режим чтения ---
+@no_throttling
+class ChapterReaderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.writer = create_writer()
+        cls.book = Book.objects.create(title='Книга', description='...', author=cls.writer)
+        cls.chapters = [append_chapter(cls.book, title=f'Глава {i}', content='Текст') for i in range(1, 6)]
+        for chapter in cls.chapters:
+            for order in range(3):
+                ChapterImage.objects.create(chapter=chapter, image=f'books/{chapter.id}/{order}.jpg', order=order)
+
+    def url(self, chapter):
+        return f'/api/books/{self.book.id}/chapter/{chapter.id}/read/'
+
+    def test_query_count_does_not_depend_on_book_size(self):
+        client = APIClient()
+        # Глава с книгой и автором, изображения, соседние главы
+        with self.assertNumQueries(4):
+            response = client.get(self.url(self.chapters[2]))
+        self.assertEqual(response.json()['chapter']['order'], 3)
+        self.assertEqual(len(response.json()['chapter']['images']), 3)
+
+        with self.assertNumQueries(5):
+            response = client.get(self.url(self.chapters[0]) + '?include_next=1')
+        self.assertEqual(len(response.json()['next']['images']), 3)
+
+        for i in range(20):
+            append_chapter(self.book, title=f'Еще {i}', content='Текст')
+        with self.assertNumQueries(4):
+            client.get(self.url(self.chapters[2]))
+
+    def test_hidden_book_is_shown_only_to_author(self):
+        Book.objects.filter(pk=self.book.pk).update(is_visible=False)
+        self.assertEqual(APIClient().get(self.url(self.chapters[0])).status_code, 404)
+
+        client = APIClient()
+        client.force_authenticate(self.writer)
+        self.assertEqual(client.get(self.url(self.chapters[0])).status_code, 200)
+
+    def test_deleted_book_is_not_shown(self):
+        Book.objects.filter(pk=self.book.pk).update(is_deleted=True)
+        client = APIClient()
+        client.force_authenticate(self.writer)
+        self.assertEqual(client.get(self.url(self.chapters[0])).status_code, 404)
+        self.assertEqual(client.get(f'/api/books/{self.book.id}/chapter/{self.chapters[0].id}/').status_code, 404)
+
+
+# --- Удаление главы ---
+@no_throttling
+class ChapterPurgeTests(FilesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.writer = create_writer()
+        self.book = Book.objects.create(title='Книга', description='...', author=self.writer)
+        self.chapters = [append_chapter(self.book, title=f'Глава {i}', content='Текст') for i in range(1, 4)]
+        ChapterImage.objects.create(chapter=self.chapters[1], image='books/map.jpg', order=1)
+        self.book.refresh_stats()
+        self.client = APIClient()
+        self.client.force_authenticate(self.writer)
+
+    def test_chapter_is_hidden_at_once_and_purged_in_background(self):
+        chapter = self.chapters[1]
+        files = os.path.join(self.base_dir, 'static', 'books', str(self.book.id), 'chapters', str(chapter.id))
+        os.makedirs(files)
+
+        response = self.client.delete(f'/api/books/{self.book.id}/chapter/{chapter.id}/delete/')
+        self.assertEqual(response.status_code, 202)
+
+        self.assertEqual(self.client.get(f'/api/books/{self.book.id}/chapter/{chapter.id}/').status_code, 404)
+        toc = self.client.get(f'/api/books/{self.book.id}/').json()['chapters']
+        self.assertEqual([(item['id'], item['order']) for item in toc],
+                         [(self.chapters[0].id, 1), (self.chapters[2].id, 2)])
+        reader = self.client.get(f'/api/books/{self.book.id}/chapter/{self.chapters[2].id}/read/').json()
+        self.assertEqual((reader['chapter']['order'], reader['prev']['id']), (2, self.chapters[0].id))
+
+        job = claim_next('w1')
+        self.assertEqual(job.pk, response.json()['job_id'])
+        self.assertTrue(execute(job))
+
+        self.assertFalse(Chapter.objects.filter(pk=chapter.pk).exists())
+        self.assertFalse(ChapterImage.objects.filter(chapter_id=chapter.pk).exists())
+        self.assertFalse(os.path.exists(files))
+        self.assertEqual(Book.objects.get(pk=self.book.pk).chapter_count, 2)
+
+
+# --- Условные запросы к тексту главы и архиву ---
+@no_throttling
+class ConditionalResponseTests(FilesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.writer = create_writer()
+        self.book = Book.objects.create(title='Книга', description='...', author=self.writer)
+        chapter = append_chapter(self.book, title='Глава', content='Текст главы')
+        chapter.compress_content()
+        self.url = f'/api/books/{self.book.id}/chapter/{chapter.id}/content/'
+
+    def test_encodings_have_own_etags(self):
+        client = APIClient()
+        plain = client.get(self.url)
+        packed = client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotEqual(plain['ETag'], packed['ETag'])
+        self.assertIn('Accept-Encoding', packed['Vary'])
+
+        # Тег несжатой версии не подходит клиенту, который просит gzip
+        response = client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=plain['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        for headers, full in (({}, plain), ({'HTTP_ACCEPT_ENCODING': 'gzip'}, packed)):
+            response = client.get(self.url, HTTP_IF_NONE_MATCH=full['ETag'], **headers)
+            self.assertEqual(response.status_code, 304)
+            for header in ('ETag', 'Vary', 'Cache-Control'):
+                self.assertEqual(response[header], full[header])
+
+    def test_if_none_match_lists_weak_tags_and_star(self):
+        client = APIClient()
+        etag = client.get(self.url)['ETag']
+        for header in (f'"other", {etag}', f'W/{etag}', '*'):
+            self.assertEqual(client.get(self.url, HTTP_IF_NONE_MATCH=header).status_code, 304, header)
+        self.assertEqual(client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_hidden_book_content_is_private(self):
+        Book.objects.filter(pk=self.book.pk).update(is_visible=False)
+        client = APIClient()
+        client.force_authenticate(self.writer)
+        self.assertEqual(client.get(self.url)['Cache-Control'], 'private, no-cache')
+
+    def test_bundle_not_modified_keeps_validators(self):
+        path = os.path.join(self.base_dir, 'bundle.zip')
+        with open(path, 'wb') as f:
+            f.write(b'0123456789')
+        factory = APIRequestFactory()
+
+        full = bundles.ranged_file_response(factory.get('/'), path, 'v1', 'application/zip')
+        full.close()
+        response = bundles.ranged_file_response(factory.get('/', HTTP_IF_NONE_MATCH='"v0", W/"v1"'), path, 'v1',
+                                                'application/zip')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((response['ETag'], response['Cache-Control']), (full['ETag'], full['Cache-Control']))
+
+
+# --- Похожие книги ---
+class SimilarBooksTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        writer = create_writer()
+        cls.genres = [Genre.objects.create(name=f'Жанр {i}') for i in range(3)]
+        cls.books = {}
+        for title, genre_indexes, visible in (('A', [0, 1], True), ('B', [0], True), ('C', [2], True),
+                                              ('D', [0, 1], False)):
+            book = Book.objects.create(title=title, description='...', author=writer, is_visible=visible)
+            book.genres.set([cls.genres[i] for i in genre_indexes])
+            cls.books[title] = book
+
+        # Оба читателя одинаково выделяют A и B на фоне C
+        for name, ratings in (('u1', {'A': 5, 'B': 5, 'C': 1}), ('u2', {'A': 4, 'B': 4, 'C': 2})):
+            reader = User.objects.create_user(username=name, email=f'{name}@example.com', password='pw')
+            for title, rating in ratings.items():
+                Comment.objects.create(user=reader, book=cls.books[title], content='...', rating=rating)
+
+    def similar(self, title):
+        return [(row.similar.title, row.score) for row in SimilarBook.objects.filter(book=self.books[title])]
+
+    def test_scores_mix_genres_and_ratings(self):
+        build_similar_books(full=True)
+
+        # Жанры: 1 / sqrt(2), оценки: косинус центрированных векторов 1; C оценена
+        # противоположно и отсекается, скрытая D не предлагается
+        [(title, score)] = self.similar('A')
+        self.assertEqual(title, 'B')
+        self.assertAlmostEqual(score, 0.4 / math.sqrt(2) + 0.6)
+        self.assertEqual(self.similar('C'), [])
+        self.assertFalse(Book.objects.filter(similar_stale=True).exists())
+
+    def test_incremental_refresh_recomputes_stale_and_referring_books(self):
+        build_similar_books(full=True)
+        self.assertEqual(build_similar_books(), 0)
+
+        # B изменилась: пересчитываются она сама и A с D, в чьих списках она есть
+        # (у скрытой книги свой список тоже строится)
+        self.books['B'].genres.set(self.genres[:2])
+        self.assertEqual(set(Book.objects.filter(similar_stale=True).values_list('title', flat=True)), {'B'})
+        self.assertEqual(build_similar_books(), 3)
+        [(_, score)] = self.similar('A')
+        self.assertAlmostEqual(score, 1.0)
+
+        reader = User.objects.create_user(username='u3', email='u3@example.com', password='pw')
+        Comment.objects.create(user=reader, book=self.books['C'], content='...', rating=3)
+        self.assertEqual(build_similar_books(), 1)
+
+
+# --- Фасеты каталога ---
+@no_throttling
+class CatalogFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = create_writer('anna')
+        cls.boris = User.objects.create_user(username='boris', email='boris@example.com', password='pw',
+                                             first_name='Борис', last_name='Рой', role='writer')
+        cls.history, cls.science, cls.travel = [Genre.objects.create(name=name)
+                                                for name in ('История', 'Наука', 'Путешествия')]
+        for title, author, genres in (('Первая', cls.anna, [cls.history, cls.science]),
+                                      ('Вторая', cls.anna, [cls.history]),
+                                      ('Третья', cls.boris, [cls.science, cls.travel])):
+            Book.objects.create(title=title, description='...', author=author).genres.set(genres)
+        hidden = Book.objects.create(title='Черновик', description='...', author=cls.boris, is_visible=False)
+        hidden.genres.set([cls.history])
+
+    def facets(self, **params):
+        data = APIClient().get('/api/books/', {'facets': 1, **params}).json()
+        genres = [(genre['name'], genre['count']) for genre in data['facets']['genres']]
+        authors = [(author['last_name'], author['count']) for author in data['facets']['authors']]
+        return sorted(book['title'] for book in data['results']), genres, authors
+
+    def test_counts_without_filters_skip_hidden_books(self):
+        titles, genres, authors = self.facets()
+        self.assertEqual(titles, ['Вторая', 'Первая', 'Третья'])
+        self.assertEqual(genres, [('История', 2), ('Наука', 2), ('Путешествия', 1)])
+        self.assertEqual(authors, [('Ли', 2), ('Рой', 1)])
+
+    def test_genre_and_search_filters_narrow_all_facets(self):
+        titles, genres, authors = self.facets(genre=self.science.id)
+        self.assertEqual(titles, ['Первая', 'Третья'])
+        self.assertEqual(genres, [('Наука', 2), ('История', 1), ('Путешествия', 1)])
+        self.assertEqual(authors, [('Ли', 1), ('Рой', 1)])
+
+        titles, genres, authors = self.facets(search='Трет')
+        self.assertEqual((titles, genres, authors), (['Третья'], [('Наука', 1), ('Путешествия', 1)], [('Рой', 1)]))
+
+    def test_author_filter_does_not_narrow_author_facet(self):
+        titles, genres, authors = self.facets(author=self.anna.id)
+        self.assertEqual(titles, ['Вторая', 'Первая'])
+        self.assertEqual(genres, [('История', 2), ('Наука', 1)])
+        self.assertEqual(authors, [('Ли', 2), ('Рой', 1)])
+
+
+# --- Потоковые ответы ---
+class StreamingTests(TestCase):
+    def test_asgi_reads_sync_stream_lazily(self):
+        produced = []
+
+        def items():
+            for i in range(1000):
+                produced.append(i)
+                yield {'id': i, 'text': 'x' * 100}
+
+        async def read(response, limit=None):
+            parts = []
+            async for part in response:
+                parts.append(part)
+                if len(parts) == limit:
+                    break
+            return parts
+
+        async_to_sync(read)(json_array_response(items()), limit=1)
+        self.assertLess(len(produced), 1000)
+
+        body = b''.join(async_to_sync(read)(json_array_response(items())))
+        self.assertEqual(json.loads(body), [{'id': i, 'text': 'x' * 100} for i in range(1000)])
+
+    @no_throttling
+    def test_stream_with_facets(self):
+        genre = Genre.objects.create(name='История')
+        book = Book.objects.create(title='Книга', description='...', author=create_writer())
+        book.genres.set([genre])
+
+        response = APIClient().get('/api/books/', {'stream': 1, 'facets': 1})
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([item['id'] for item in data['results']], [book.id])
+        self.assertEqual(data['facets']['genres'], [{'id': genre.id, 'name': 'История', 'count': 1}])
+
+
+# --- Пакетная выдача глав ---
+@no_throttling
+class ChapterBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.writer = create_writer()
+        cls.book = Book.objects.create(title='Книга', description='...', author=cls.writer)
+        cls.chapters = [append_chapter(cls.book, title=f'Глава {i}', content='Текст') for i in range(1, 11)]
+        for chapter in cls.chapters:
+            for order in range(2):
+                ChapterImage.objects.create(chapter=chapter, image=f'books/{chapter.id}/{order}.jpg', order=order)
+
+    def fetch(self, ids):
+        response = APIClient().get('/api/chapters/batch/', {'ids': ','.join(map(str, ids))})
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        # Главы с книгами и порядковыми номерами, изображения
+        with self.assertNumQueries(2):
+            [chapter] = self.fetch([self.chapters[3].id])
+        self.assertEqual((chapter['order'], len(chapter['images'])), (4, 2))
+
+        with self.assertNumQueries(2):
+            chapters = self.fetch([chapter.id for chapter in self.chapters])
+        self.assertEqual([chapter['order'] for chapter in chapters], list(range(1, 11)))
+
+    def test_queries_grow_per_chunk(self):
+        with mock.patch('app.views.BATCH_CHUNK_SIZE', 4), self.assertNumQueries(6):
+            chapters = self.fetch([chapter.id for chapter in self.chapters] + [0])
+        self.assertEqual(chapters[-1], {'id': 0, 'error': 'not_found'})
+
+
+# --- Панель писателя ---
+@no_throttling
+class WriterDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.writer = create_writer()
+        cls.reader = User.objects.create_user(username='reader', email='reader@example.com', password='pw')
+        cls.genre = Genre.objects.create(name='История')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.writer)
+
+    def create_books(self, count):
+        for i in range(count):
+            book = Book.objects.create(title=f'Книга {i}', description='...', author=self.writer)
+            book.genres.set([self.genre])
+            append_chapter(book, title='Глава', content='Текст')
+            # Обычно пересчитывается фоновой задачей статистики
+            book.refresh_stats()
+            Comment.objects.create(user=self.reader, book=book, content='Хорошо', rating=4)
+
+    def test_dashboard_query_count_does_not_depend_on_catalog_size(self):
+        self.create_books(1)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/mybooks/dashboard/')
+        [book] = response.json()
+        self.assertEqual((book['chapter_count'], book['review_count']), (1, 1))
+        self.assertIsNotNone(book['last_review_at'])
+
+        self.create_books(9)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/mybooks/dashboard/')
+        self.assertEqual(len(response.json()), 10)
+
+    def test_my_books_query_count_does_not_depend_on_catalog_size(self):
+        self.create_books(1)
+        # Книги с автором, жанры
+        with self.assertNumQueries(2):
+            self.client.get('/api/mybooks/')
+
+        self.create_books(9)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/mybooks/')
+        self.assertEqual(len(response.json()), 10)
+
+
+# --- Лента популярного ---
+class TrendingFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Книга', description='...', author=create_writer())
+        cls.readers = [User.objects.create_user(username=f'reader{i}', email=f'reader{i}@example.com', password='pw')
+                       for i in range(3)]
+
+    def trending(self):
+        return FeedEntry.objects.filter(book=self.book, feed='trending', genre__isnull=True) \
+                                .values_list('score', flat=True).first()
+
+    def rebuilt_trending(self):
+        incremental = self.trending()
+        rebuild_feeds()
+        return incremental, self.trending()
+
+    def test_incremental_updates_match_rebuild(self):
+        comments = [Comment.objects.create(user=reader, book=self.book, content='Хорошо', rating=5)
+                    for reader in self.readers]
+        incremental, rebuilt = self.rebuilt_trending()
+        self.assertAlmostEqual(incremental, rebuilt, places=6)
+
+        comments[1].delete()
+        incremental, rebuilt = self.rebuilt_trending()
+        self.assertAlmostEqual(incremental, rebuilt, places=6)
+
+        comments[0].delete()
+        comments[2].delete()
+        self.assertIsNone(self.trending())
+
+    def test_activity_leaves_feed_after_window(self):
+        Comment.objects.create(user=self.readers[0], book=self.book, content='Хорошо', rating=5)
+        later = timezone.now() + TRENDING_WINDOW + timedelta(days=1)
+
+        with mock.patch('app.feeds.timezone.now', return_value=later):
+            self.book.save()
+            self.assertIsNone(self.trending())
+            rebuild_feeds()
+            self.assertIsNone(self.trending())
+
+
+# --- Индекс автодополнения ---
+class PrefixIndexTests(TestCase):
+    def test_incremental_updates_match_full_load(self):
+        index = autocomplete.PrefixIndex()
+        index.load([('book', 1, 'Глубокое время', 3), ('writer', 1, 'Анна Ли', 2)])
+        index.add('book', 2, 'Краткая история времени', 5)
+        index.add('book', 1, 'Глубокое прошлое', 4)
+        index.add('genre', 1, 'История')
+        index.remove('writer', 1)
+        index.remove('writer', 99)
+
+        expected = autocomplete.PrefixIndex()
+        expected.load([('book', 1, 'Глубокое прошлое', 4), ('book', 2, 'Краткая история времени', 5),
+                       ('genre', 1, 'История', 0)])
+        self.assertEqual(index._keys, expected._keys)
+        self.assertEqual(index._items, expected._items)
+        self.assertEqual([item['id'] for item in index.search('глуб')], [1])
+        self.assertEqual(index.search('время'), [])
+
+    def test_update_without_weight_keeps_weight(self):
+        index = autocomplete.PrefixIndex()
+        index.load([('writer', 1, 'Анна Ли', 7)])
+        index.add('writer', 1, 'Анна Ли-Смит')
+        self.assertEqual(index._items[('writer', 1)][1], 7)
+
+    def test_edits_do_not_change_list_being_searched(self):
+        index = autocomplete.PrefixIndex()
+        index.load([('book', i, f'Книга {i}', 0) for i in range(100)])
+        keys = index._keys
+        snapshot = list(keys)
+
+        for i in range(50):
+            index.remove('book', i)
+        index.add('book', 500, 'Книга новая', 0)
+        self.assertEqual(keys, snapshot)
+
+        errors = []
+
+        def edit():
+            for i in range(300):
+                index.add('book', 1000 + i, f'Книга {i}', 0)
+                index.remove('book', 1000 + i)
+
+        def search():
+            try:
+                for _ in range(300):
+                    index.search('книга', limit=50)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=edit), threading.Thread(target=search)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
+class AutocompleteRefreshTests(TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, autocomplete, '_index', autocomplete._index)
+        autocomplete._index = None
+
+    def test_book_save_keeps_writer_rank(self):
+        writer = create_writer()
+        Book.objects.create(title='Первая', description='...', author=writer)
+        Book.objects.create(title='Вторая', description='...', author=writer)
+        index = autocomplete.get_index()
+        self.assertEqual(index._items[('writer', writer.id)][1], 2)
+
+        Book.objects.create(title='Третья', description='...', author=writer)
+        self.assertEqual(index._items[('writer', writer.id)][1], 2)
+
+    def test_refresh_picks_up_writes_of_other_workers(self):
+        autocomplete.get_index()
+        # Запись, сделанная другим воркером: сигналы этого процесса ее не видели
+        with mock.patch.object(autocomplete, '_index', None):
+            Genre.objects.create(name='Космология')
+        self.assertEqual(autocomplete.get_index().search('косм'), [])
+
+        autocomplete.refresh_index()
+        self.assertEqual([item['label'] for item in autocomplete.get_index().search('косм')], ['Космология'])
+
+    def test_stale_index_schedules_background_refresh(self):
+        autocomplete.get_index()
+        with mock.patch.object(autocomplete, '_built_at', time.monotonic() - 3600), \
+                mock.patch.object(autocomplete, 'schedule_refresh') as schedule_refresh:
+            autocomplete.get_index()
+        schedule_refresh.assert_called_once()
+
+
+# --- Порядок глав ---
+class ChapterOrderingTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='Книга', description='...', author=create_writer())
+        self.chapters = [append_chapter(self.book, title=f'Глава {i}', content='Текст') for i in range(1, 4)]
+
+    def titles(self):
+        return [chapter.title for chapter in Chapter.objects.for_toc().filter(book=self.book).order_by('order')]
+
+    def test_move_between_neighbours_takes_middle_position(self):
+        first, second, third = self.chapters
+        move_chapter(third, 2)
+        third.refresh_from_db()
+        self.assertEqual(third.position, (first.position + second.position) // 2)
+        self.assertEqual(self.titles(), ['Глава 1', 'Глава 3', 'Глава 2'])
+        self.assertFalse(Job.objects.filter(name='rebalance_chapters').exists())
+
+    def test_small_gap_schedules_rebalance(self):
+        Chapter.objects.filter(pk=self.chapters[1].pk).update(position=self.chapters[0].position + 10)
+        move_chapter(self.chapters[2], 2)
+        self.assertEqual(self.titles(), ['Глава 1', 'Глава 3', 'Глава 2'])
+        self.assertTrue(Job.objects.filter(name='rebalance_chapters').exists())
+
+    def test_no_gap_left_renumbers_synchronously(self):
+        for position, chapter in enumerate(self.chapters, start=1):
+            Chapter.objects.filter(pk=chapter.pk).update(position=position)
+        move_chapter(Chapter.objects.get(pk=self.chapters[2].pk), 2)
+        self.assertEqual(self.titles(), ['Глава 1', 'Глава 3', 'Глава 2'])
+        positions = sorted(Chapter.objects.filter(book=self.book).values_list('position', flat=True))
+        self.assertGreater(min(b - a for a, b in zip(positions, positions[1:])), 1)
+
+    def test_rebalance_renumbers_evenly_keeping_order(self):
+        for position, chapter in zip([5, 6, 900], self.chapters):
+            Chapter.objects.filter(pk=chapter.pk).update(position=position)
+        rebalance_book(self.book.id)
+        positions = list(Chapter.objects.filter(book=self.book).order_by('position').values_list('title', 'position'))
+        self.assertEqual(positions, [(f'Глава {i}', i * CHAPTER_POSITION_GAP) for i in range(1, 4)])
+
+    def test_chapters_awaiting_purge_do_not_count(self):
+        deleted = append_chapter(self.book, title='Удаленная', content='Текст')
+        move_chapter(deleted, 1)
+        schedule_chapter_purge(deleted)
+
+        move_chapter(self.chapters[2], 2)
+        self.assertEqual(self.titles(), ['Глава 1', 'Глава 3', 'Глава 2'])
+        # Свободная позиция в начале не сталкивается с позицией удаленной главы
+        move_chapter(self.chapters[1], 1)
+        self.assertEqual(self.titles(), ['Глава 2', 'Глава 1', 'Глава 3'])
+        self.assertEqual(smallest_gap(self.book.id), Chapter.objects.get(pk=self.chapters[1].pk).position)
+
+    def test_window_order_matches_lookup_order(self):
+        other = Book.objects.create(title='Другая', description='...', author=self.book.author)
+        append_chapter(other, title='Другая 1', content='Текст')
+        move_chapter(self.chapters[0], 3)
+        listed = {chapter.id: chapter.order for chapter in Chapter.objects.with_order()}
+        looked_up = {chapter.id: chapter.order for chapter in Chapter.objects.with_order_lookup()}
+        self.assertEqual(listed, looked_up)
+        self.assertEqual(sorted(listed.values()), [1, 1, 2, 3])
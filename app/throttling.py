@@ -0,0 +1,185 @@
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+from .metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Область: {'anon': (запросов в секунду, запросов за окно), 'user': (...)}; представление
+    # выбирает область атрибутом throttle_scope, иначе действует 'default'
+    'SCOPES': {
+        'default': {'anon': (5, 60), 'user': (10, 120)},
+    },
+    # Псевдоним кэша со счетчиками; он должен быть общим для всех воркеров (Redis, Memcached)
+    'CACHE': 'throttling',
+    # Сколько секунд после ошибки общего кэша считать запросы в памяти процесса
+    'FALLBACK_SECONDS': 30,
+}
+
+# Счетчики на время недоступности общего кэша: лимит действует в каждом процессе отдельно
+fallback_cache = LocMemCache('throttling-fallback', {})
+_shared_down_until = 0
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'THROTTLING', {})}
+
+
+# --- Скользящее окно на атомарных счетчиках кэша ---
+# Время делится на окна по capacity / rate секунд, и за последнее окно допускается
+# не больше capacity запросов. Запрос увеличивает счетчик текущего окна через
+# cache.incr, который в Redis и Memcached атомарен, так что воркеры без блокировок
+# делят один счетчик. Предыдущее окно учитывается долей, еще не ушедшей из
+# скользящего окна; отклоненный запрос свою отметку снимает.
+def count_request(cache, key, rate, capacity):
+    window = capacity / rate
+    position = time.time() / window
+    slot = int(position)
+    elapsed = position - slot
+    current_key = f'{key}:{slot}'
+
+    cache.add(current_key, 0, math.ceil(window * 2) + 1)
+    used = cache.incr(current_key)
+    previous = cache.get(f'{key}:{slot - 1}', 0)
+    carried = previous * (1 - elapsed)
+    if carried + used <= capacity:
+        return True, 0
+
+    cache.decr(current_key)
+    # Доля предыдущего окна уходит со скоростью previous / window запросов в секунду;
+    # если этого не хватит, ждать придется начала следующего окна
+    remaining = (1 - elapsed) * window
+    needed = carried + used - capacity
+    if previous and needed * window / previous < remaining:
+        return False, needed * window / previous
+    return False, remaining
+
+
+def shared_cache_available():
+    return time.monotonic() >= _shared_down_until
+
+
+def mark_shared_cache_down(seconds):
+    global _shared_down_until
+    _shared_down_until = time.monotonic() + seconds
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    def allow_request(self, request, view):
+        config = get_config()
+        if not config['ENABLED']:
+            return True
+
+        scope = getattr(view, 'throttle_scope', 'default')
+        limits = config['SCOPES'].get(scope) or config['SCOPES']['default']
+        if request.user and request.user.is_authenticated:
+            kind, ident = 'user', request.user.pk
+        else:
+            kind, ident = 'anon', self.get_ident(request)
+
+        rate, capacity = limits[kind]
+        key = f'throttle:{scope}:{kind}:{ident}'
+        allowed = None
+        if shared_cache_available():
+            try:
+                allowed, self.retry_after = count_request(caches[config['CACHE']], key, rate, capacity)
+            except Exception:
+                # Сбой кэша не должен останавливать API: на время считаем запросы в процессе
+                logger.warning('Throttle cache is unavailable, using per-process counters for %ss',
+                               config['FALLBACK_SECONDS'], exc_info=True)
+                mark_shared_cache_down(config['FALLBACK_SECONDS'])
+        if allowed is None:
+            allowed, self.retry_after = count_request(fallback_cache, key, rate, capacity)
+
+        if not allowed:
+            registry.inc('requests_throttled_total', {'scope': scope, 'kind': kind})
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+# --- Сброс нагрузки по числу запросов в работе ---
+SHED_DEFAULTS = {
+    'ENABLED': True,
+    # С этой глубины отклоняются дорогие представления (shed_first = True)
+    'EXPENSIVE_AT': 8,
+    # С этой — все, кроме исключенных маршрутов
+    'ALL_AT': 32,
+    # Время в очереди балансировщика (заголовок X-Request-Start, мс), после которого
+    # дорогие запросы тоже отклоняются
+    'MAX_QUEUE_MS': 2000,
+    'RETRY_AFTER': 2,
+    'EXEMPT_ROUTES': ['metrics', 'api/login/', 'api/token/refresh/'],
+}
+
+
+def get_shed_config():
+    return {**SHED_DEFAULTS, **getattr(settings, 'LOAD_SHEDDING', {})}
+
+
+def queue_time_ms(request):
+    # nginx: "t=1700000000.123", Heroku и другие: миллисекунды
+    value = request.headers.get('X-Request-Start', '').removeprefix('t=')
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    if started > 1e11:
+        started /= 1000
+    return max(time.time() - started, 0) * 1000
+
+
+class LoadShedMiddleware:
+    def __init__(self, get_response):
+        self.config = get_shed_config()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.lock = threading.Lock()
+        self.in_flight = 0
+
+    def __call__(self, request):
+        with self.lock:
+            self.in_flight += 1
+            request.in_flight = self.in_flight
+        try:
+            return self.get_response(request)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route = request.resolver_match.route if request.resolver_match else ''
+        if route in self.config['EXEMPT_ROUTES']:
+            return None
+
+        view = getattr(view_func, 'view_class', view_func)
+        expensive = getattr(view, 'shed_first', False)
+        queued = queue_time_ms(request)
+
+        if request.in_flight >= self.config['ALL_AT']:
+            reason = 'overload'
+        elif expensive and request.in_flight >= self.config['EXPENSIVE_AT']:
+            reason = 'expensive'
+        elif expensive and queued is not None and queued > self.config['MAX_QUEUE_MS']:
+            reason = 'queue_time'
+        else:
+            return None
+
+        registry.inc('requests_shed_total', {'route': route, 'reason': reason})
+        response = JsonResponse({'detail': 'Сервер перегружен, повторите запрос позже.'}, status=503)
+        response['Retry-After'] = str(self.config['RETRY_AFTER'])
+        return response
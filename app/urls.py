@@ -9,16 +9,28 @@ urlpatterns = [
     path('logout/', user_logout),
     path('writers/', WriterListView.as_view()),
     path('genres/', GenreListView.as_view()),
+    path('autocomplete/', AutocompleteView.as_view()),
     path('books/', BookListView.as_view()),
+    path('books/batch/', BookBatchView.as_view()),
+    path('chapters/batch/', ChapterBatchView.as_view()),
     path('mybooks/', MyBooksView.as_view()),
+    path('mybooks/dashboard/', WriterDashboardView.as_view()),
+    path('feeds/<str:feed>/', FeedView.as_view()),
     path('books/<int:id>/edit/', BookUpdateView.as_view()),
     path('books/<int:id>/delete/', BookDeleteView.as_view()),
     path('books/<int:id>/comments/', BookCommentsListView.as_view()),
+    path('books/<int:id>/events/', book_events),
+    path('books/<int:id>/bundle/', BookBundleView.as_view()),
+    path('books/<int:id>/similar/', SimilarBooksView.as_view()),
     path('books/<int:id>/comment/upload/', CreateCommentView.as_view()),
     path('books/<int:id>/', BookDetailView.as_view()),
     path('books/upload/', upload_book),
     path('books/<int:book_id>/chapter/<int:chapter_id>/edit/', ChapterUpdateView.as_view()),
     path('books/<int:book_id>/chapter/<int:chapter_id>/delete/', ChapterDeleteView.as_view()),
+    path('books/<int:book_id>/chapter/<int:chapter_id>/move/', ChapterMoveView.as_view()),
+    path('books/<int:book_id>/chapter/<int:chapter_id>/read/', ChapterReaderView.as_view()),
+    path('books/<int:book_id>/chapter/<int:chapter_id>/content/', ChapterContentView.as_view()),
     path('books/<int:book_id>/chapter/<int:chapter_id>/', ChapterDetailView.as_view()),
     path('books/<int:book_id>/chapter/upload/', ChapterCreateView.as_view()),
+    path('jobs/<int:id>/', JobDetailView.as_view()),
 ]
@@ -6,26 +6,59 @@ from rest_framework.views import APIView
 from rest_framework import generics
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.permissions import BasePermission
+from django.utils.cache import get_conditional_response
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.parsers import MultiPartParser
 from django.contrib.auth import get_user_model
-from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.exceptions import NotFound, ParseError, PermissionDenied
 from rest_framework.decorators import api_view, permission_classes
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from django.conf import settings
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Count, Q
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
+import gzip
 import json
 import os
+import time
 
 from .models import *
 from .serializers import *
+from . import autocomplete, bundles, cards, events, metrics
+from .feeds import FEEDS
+from .ordering import append_chapter, move_chapter
+from .streaming import chunked, json_array_response, json_object_response, serialize_stream, wants_stream
+from .tasks import (schedule_book_purge, schedule_bundle, schedule_chapter_images, schedule_chapter_purge,
+                    schedule_chapter_stats, static_path)
 
 User = get_user_model()
+
+BATCH_MAX_IDS = 300
+BATCH_CHUNK_SIZE = 100
+
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+FACET_AUTHOR_LIMIT = 50
     
 
+# --- Список id из параметров запроса (?ids=1,2,3) ---
+def parse_batch_ids(request):
+    raw = ','.join(request.query_params.getlist('ids'))
+    try:
+        ids = [int(value) for value in raw.split(',') if value.strip()]
+    except ValueError:
+        raise ParseError('Ожидается список целых чисел через запятую.')
+
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ParseError('Не передано ни одного id.')
+    if len(ids) > BATCH_MAX_IDS:
+        raise ParseError(f'Можно запросить не более {BATCH_MAX_IDS} объектов за раз.')
+    return ids
+
+
 # --- Проверка роли ---
 class IsWriter(BasePermission):
     def has_permission(self, request, view):
@@ -35,6 +68,7 @@ class IsWriter(BasePermission):
 # --- Добавление роли на клиент ---
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
+    throttle_scope = 'auth'
 
 
 # --- Логика на обновление токена ---
@@ -44,10 +78,13 @@ class MyTokenRefreshView(TokenRefreshView):
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
 
+        start = time.perf_counter()
         try:
             serializer.is_valid(raise_exception=True)
         except Exception:
             return Response({'error': 'Invalid refresh token'}, status=status.HTTP_401_UNAUTHORIZED)
+        finally:
+            metrics.registry.observe('jwt_refresh_seconds', {}, time.perf_counter() - start)
 
         return Response(serializer.validated_data, status=status.HTTP_200_OK)
    
@@ -57,6 +94,7 @@ class MyTokenRefreshView(TokenRefreshView):
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
     permission_classes = [AllowAny]
+    throttle_scope = 'auth'
 
 
 # --- Выход ---
@@ -93,7 +131,7 @@ def upload_book(request):
 # --- Редактирование книги ---
 class BookUpdateView(generics.UpdateAPIView):
     permission_classes = [IsAuthenticated, IsWriter]
-    queryset = Book.objects.all()
+    queryset = Book.objects.filter(is_deleted=False)
     serializer_class = BookCESerializer
     lookup_field = 'id'
 
@@ -107,9 +145,11 @@ class BookUpdateView(generics.UpdateAPIView):
 # --- Писатели ---
 class WriterListView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
+    shed_first = True
     
-    def get(self, request):
-        search = request.query_params.get('search', '')
+    def get_queryset(self):
+        search = self.request.query_params.get('search', '')
 
         writers = User.objects.annotate(book_count=Count('book')) \
                               .filter(role='writer', book_count__gt=0)
@@ -117,9 +157,12 @@ class WriterListView(APIView):
         if search:
             writers = writers.filter(first_name__icontains=search)
 
-        writers = writers.order_by('first_name')
+        return writers.order_by('first_name')
 
-        serializer = WriterSerializer(writers, many=True)
+    def get(self, request):
+        if wants_stream(request):
+            return json_array_response(serialize_stream(self.get_queryset(), WriterSerializer))
+        serializer = WriterSerializer(self.get_queryset(), many=True)
         return Response(serializer.data)
     
 
@@ -127,46 +170,75 @@ class WriterListView(APIView):
 class GenreListView(APIView):
     permission_classes = [AllowAny]
     
+    def get_queryset(self):
+        return Genre.objects.filter(is_active=True)
+
     def get(self, request):
-        genres = Genre.objects.filter(is_active=True)
-        serializer = GenreSerializer(genres, many=True)
+        serializer = GenreSerializer(self.get_queryset(), many=True)
         return Response(serializer.data)
     
 
+# --- Автодополнение поиска (названия, писатели, жанры) ---
+class AutocompleteView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_scope = 'search'
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = int(request.query_params.get('limit', autocomplete.DEFAULT_LIMIT))
+        except ValueError:
+            raise ParseError('Параметр limit должен быть целым числом.')
+        limit = min(max(limit, 1), autocomplete.MAX_LIMIT)
+
+        return Response(autocomplete.get_index().search(query, limit))
+
+
 # --- Все книги ---
 class BookListView(APIView):
     permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
+    shed_first = True
 
-    def get(self, request):
-        books = Book.objects.filter(is_visible=True).select_related('author').prefetch_related('genres')
+    # Каталог читается из карточек: одна таблица, без соединений и distinct
+    def filter_cards(self, by_author=True):
+        books = BookCard.objects.all()
 
-        genre_ids = request.query_params.getlist('genre')
-        author_id = request.query_params.get('author')
-        search = request.query_params.get('search')
-        sort_field = request.query_params.get('sort_field')
-        sort_direction = request.query_params.get('sort_direction', 'asc')
-        order_prefix = '' if sort_direction == 'asc' else '-'
+        genre_ids = self.request.query_params.getlist('genre')
+        author_id = self.request.query_params.get('author')
+        search = self.request.query_params.get('search')
 
-        if genre_ids:
-            books = books.filter(genres__id__in=genre_ids) \
-                         .annotate(matched_genres=Count('genres', filter=Q(genres__id__in=genre_ids), distinct=True)) \
-                         .filter(matched_genres=len(genre_ids))
+        try:
+            genre_ids = {int(genre_id) for genre_id in genre_ids}
+        except ValueError:
+            raise ParseError('Параметр genre должен быть целым числом.')
+        for genre_id in genre_ids:
+            books = books.filter(genre_ids__contains=cards.genre_filter_value(genre_id))
 
-        if author_id:
-            books = books.filter(author__id=author_id)
+        if author_id and by_author:
+            books = books.filter(author_id=author_id)
 
         if search:
             books = books.filter(
                 Q(title__icontains=search) |
-                Q(author__first_name__icontains=search) |
-                Q(author__last_name__icontains=search) |
-                Q(author__surname__icontains=search)
+                Q(author_first_name__icontains=search) |
+                Q(author_last_name__icontains=search) |
+                Q(author_surname__icontains=search)
             )
 
-        if sort_field == 'rating':
-            books = books.annotate(average_rating=Avg('comments__rating'))
+        if self.request.query_params.get('sort_field') == 'rating':
             books = books.filter(average_rating__isnull=False)
 
+        return books
+
+    def get_queryset(self):
+        books = self.filter_cards()
+
+        sort_field = self.request.query_params.get('sort_field')
+        sort_direction = self.request.query_params.get('sort_direction', 'asc')
+        order_prefix = '' if sort_direction == 'asc' else '-'
+
         if sort_field:
             if sort_field == 'rating':
                 books = books.order_by(f"{order_prefix}average_rating")
@@ -175,25 +247,109 @@ class BookListView(APIView):
             else:
                 books = books.order_by(f"{order_prefix}{sort_field}")
 
-        books = books.distinct()
+        return books
+
+    # Число книг по жанрам и авторам при текущих фильтрах: по одному
+    # групповому запросу, сколько бы жанров ни было. Фасет авторов не учитывает
+    # фильтр по автору, иначе в нем всегда был бы один выбранный автор.
+    def get_facets(self):
+        matched = self.filter_cards().values('book_id')
+        genres = Book.genres.through.objects.filter(book_id__in=matched) \
+                                            .values('genre_id', 'genre__name') \
+                                            .annotate(count=Count('book_id')) \
+                                            .order_by('-count', 'genre__name')
+        authors = self.filter_cards(by_author=False) \
+                      .values('author_id', 'author_first_name', 'author_last_name', 'author_surname') \
+                      .annotate(count=Count('book_id')) \
+                      .order_by('-count', 'author_last_name')[:FACET_AUTHOR_LIMIT]
+
+        return {
+            'genres': [{'id': row['genre_id'], 'name': row['genre__name'], 'count': row['count']} for row in genres],
+            'authors': [{
+                'id': row['author_id'],
+                'first_name': row['author_first_name'],
+                'last_name': row['author_last_name'],
+                'surname': row['author_surname'],
+                'count': row['count'],
+            } for row in authors],
+        }
 
-        serializer = BookSerializer(books, many=True)
+    def get(self, request):
+        with_facets = request.query_params.get('facets') in ('1', 'true')
+        if wants_stream(request):
+            books = serialize_stream(self.get_queryset(), BookCardSerializer)
+            if with_facets:
+                # Фасеты — небольшой словарь, он считается до начала потока
+                return json_object_response({'facets': self.get_facets(), 'results': books})
+            return json_array_response(books)
+        serializer = BookCardSerializer(self.get_queryset(), many=True)
+        if with_facets:
+            return Response({'results': serializer.data, 'facets': self.get_facets()})
         return Response(serializer.data)
 
 
+# --- Ленты: лучшие, популярные, новые ---
+class FeedView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, feed):
+        if feed not in FEEDS:
+            raise NotFound('Лента не найдена')
+
+        genre_id = request.query_params.get('genre')
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', FEED_PAGE_SIZE)), 1), FEED_MAX_PAGE_SIZE)
+            genre_id = int(genre_id) if genre_id else None
+        except ValueError:
+            raise ParseError('Параметры genre, offset и limit должны быть целыми числами.')
+
+        entries = FeedEntry.objects.filter(feed=feed, genre_id=genre_id) \
+                                   .select_related('book__author') \
+                                   .prefetch_related('book__genres') \
+                                   .order_by('-score')[offset:offset + limit]
+
+        results = []
+        for entry in entries:
+            data = BookSerializer(entry.book).data
+            data['score'] = entry.score
+            results.append(data)
+
+        return Response({'feed': feed, 'genre': genre_id, 'offset': offset, 'results': results})
+
+
 # --- Книги авторизованного пользователя ---
 class MyBooksView(APIView):
     permission_classes = [IsAuthenticated, IsWriter]
 
     def get(self, request):
-        books = Book.objects.filter(author=request.user).select_related('author').prefetch_related('genres')
+        books = Book.objects.filter(author=request.user, is_deleted=False) \
+                            .select_related('author') \
+                            .prefetch_related('genres')
         serializer = BookSerializer(books, many=True)
         return Response(serializer.data)
 
 
+# --- Панель писателя: все его книги со статистикой одним запросом ---
+class WriterDashboardView(APIView):
+    permission_classes = [IsAuthenticated, IsWriter]
+
+    def get(self, request):
+        last_review = Comment.objects.filter(book=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+        books = Book.objects.filter(author=request.user, is_deleted=False) \
+                            .only('id', 'title', 'cover', 'created_at', 'is_visible', 'hidden_comment',
+                                  'chapter_count', 'word_count', 'reading_time', 'rating_count', 'rating_sum') \
+                            .annotate(last_review_at=Subquery(last_review)) \
+                            .order_by('-created_at')
+        serializer = WriterDashboardBookSerializer(books, many=True)
+        return Response(serializer.data)
+
+
 # --- Детальное отображение книги ---
 class BookDetailView(generics.RetrieveAPIView):
-    queryset = Book.objects.prefetch_related('genres', 'chapters').select_related('author')
+    queryset = Book.objects.filter(is_deleted=False) \
+                           .prefetch_related('genres', Prefetch('chapters', queryset=Chapter.objects.for_toc())) \
+                           .select_related('author')
     serializer_class = BookDetailSerializer
     lookup_field = 'id'
     permission_classes = [AllowAny]
@@ -209,17 +365,63 @@ class BookDetailView(generics.RetrieveAPIView):
         return Response(data)
     
 
+# --- Пакетное получение книг ---
+class BookBatchView(APIView):
+    permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
+    shed_first = True
+
+    def get(self, request):
+        ids = parse_batch_ids(request)
+        user_id = request.user.id if request.user.is_authenticated else None
+        return json_array_response(self.iter_books(ids, user_id))
+
+    def iter_books(self, ids, user_id):
+        queryset = Book.objects.filter(is_deleted=False) \
+                               .select_related('author') \
+                               .prefetch_related('genres', Prefetch('chapters', queryset=Chapter.objects.for_toc()))
+
+        for chunk in chunked(ids, BATCH_CHUNK_SIZE):
+            books = queryset.in_bulk(chunk)
+            for book_id in chunk:
+                book = books.get(book_id)
+                is_owner = book is not None and book.author_id == user_id
+
+                if book is None or not (book.is_visible or is_owner):
+                    yield {'id': book_id, 'error': 'not_found'}
+                    continue
+
+                data = BookDetailSerializer(book).data
+                data['is_owner'] = is_owner
+                yield data
+
+
+# --- Похожие книги ---
+class SimilarBooksView(generics.ListAPIView):
+    permission_classes = [AllowAny]
+    serializer_class = SimilarBookSerializer
+
+    def get_queryset(self):
+        return SimilarBook.objects.filter(book_id=self.kwargs['id'], similar__is_visible=True) \
+                                  .select_related('similar__author') \
+                                  .order_by('rank')
+
+
 # --- Удаление книги ---
 class BookDeleteView(generics.DestroyAPIView):
     permission_classes = [IsAuthenticated, IsWriter]
-    queryset = Book.objects.all()
+    queryset = Book.objects.filter(is_deleted=False)
     serializer_class = BookDetailSerializer
     lookup_field = 'id'
 
+    def destroy(self, request, *args, **kwargs):
+        job = self.perform_destroy(self.get_object())
+        return Response({'job_id': job.id}, status=status.HTTP_202_ACCEPTED)
+
     def perform_destroy(self, instance):
         if instance.author != self.request.user:
             raise PermissionDenied("Вы не можете удалить эту книгу.")
-        return super().perform_destroy(instance)
+        return schedule_book_purge(instance, user=self.request.user)
     
     
 # --- Создание главы ---
@@ -229,7 +431,7 @@ class ChapterCreateView(APIView):
 
     def post(self, request, book_id):
         try:
-            book = Book.objects.get(pk=book_id)
+            book = Book.objects.get(pk=book_id, is_deleted=False)
         except Book.DoesNotExist:
             return Response({'detail': 'Книга не найдена'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -238,17 +440,14 @@ class ChapterCreateView(APIView):
             title = serializer.validated_data['title']
             content = serializer.validated_data['content']
 
-            last_order = Chapter.objects.filter(book=book).aggregate(models.Max('order'))['order__max'] or 0
-            order = last_order + 1
-
-            chapter = Chapter.objects.create(book=book, title=title, content=content, order=order)
+            chapter = append_chapter(book, title=title, content=content)
+            chapter.compress_content()
 
             images = request.FILES.getlist('images')
             captions = request.data.getlist('captions')
             orders = request.data.getlist('orders')
 
-            chapter_dir = os.path.join(settings.BASE_DIR, 'static', 'books', str(book.id), 'chapters', str(chapter.id))
-            os.makedirs(chapter_dir, exist_ok=True)
+            files = []
 
             for i, image in enumerate(images):
                 caption = captions[i] if i < len(captions) else ''
@@ -258,22 +457,23 @@ class ChapterCreateView(APIView):
                     last_image_order = ChapterImage.objects.filter(chapter=chapter).aggregate(models.Max('order'))['order__max'] or 0
                     image_order = last_image_order + 1
 
-                image_path = os.path.join(chapter_dir, image.name)
-                with open(image_path, 'wb+') as f:
-                    for chunk in image.chunks():
-                        f.write(chunk)
-
                 relative_path = f"/static/books/{book.id}/chapters/{chapter.id}/{image.name}"
+                files.append((image, relative_path))
 
                 ChapterImage.objects.create(
                     chapter=chapter,
                     image=relative_path,
                     caption=caption,
-                    order=image_order
+                    order=image_order,
+                    is_pending=True
                 )
 
+            job = schedule_chapter_images(chapter, files, user=request.user) if files else None
+            schedule_chapter_stats(chapter)
+
             return Response({
                 'id': chapter.id,
+                'job_id': job.id if job else None,
                 'message': 'Глава успешно добавлена'
             }, status=status.HTTP_201_CREATED)
 
@@ -286,7 +486,10 @@ class ChapterDetailView(generics.RetrieveAPIView):
     serializer_class = ChapterDetailSerializer
 
     def get_queryset(self):
-        return Chapter.objects.select_related('book__author').prefetch_related('images')
+        return Chapter.objects.filter(is_deleted=False, book__is_deleted=False) \
+                              .with_order_lookup() \
+                              .select_related('book__author') \
+                              .prefetch_related('images')
 
     def get_object(self):
         queryset = self.get_queryset()
@@ -308,13 +511,140 @@ class ChapterDetailView(generics.RetrieveAPIView):
         return Response(data)
         
 
+# --- Кэширование текста и архива книги ---
+# Скрытую книгу видит только автор: общим кэшам ее хранить нельзя
+def content_cache_control(book):
+    return 'no-cache' if book.is_visible else 'private, no-cache'
+
+
+# --- Поддерживает ли клиент gzip ---
+def accepts_gzip(request):
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = item.strip().partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+# --- Текст главы, сжатый заранее при сохранении ---
+class ChapterContentView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, book_id, chapter_id):
+        try:
+            stored = CompressedContent.objects.select_related('chapter__book') \
+                                              .defer('chapter__content') \
+                                              .get(chapter_id=chapter_id, chapter__book_id=book_id, chapter__is_deleted=False)
+        except CompressedContent.DoesNotExist:
+            # Главы, сохраненные до появления сжатия или в обход API
+            chapter = Chapter.objects.select_related('book').filter(id=chapter_id, book_id=book_id, is_deleted=False).first()
+            if chapter is None:
+                raise NotFound('Chapter not found')
+            stored = chapter.compress_content()
+
+        book = stored.chapter.book
+        is_owner = request.user.is_authenticated and book.author_id == request.user.id
+        if book.is_deleted or not (book.is_visible or is_owner):
+            raise NotFound('Chapter not found')
+
+        # Сжатое и исходное представления различаются побайтно, поэтому и ETag у них разный
+        use_gzip = accepts_gzip(request)
+        etag = f'"{stored.etag}-{stored.encoding}"' if use_gzip else f'"{stored.etag}"'
+
+        # Список тегов, слабые теги W/ и * разбирает Django
+        response = get_conditional_response(request, etag=etag)
+        if response is None and use_gzip:
+            response = HttpResponse(bytes(stored.data), content_type='text/plain; charset=utf-8')
+            response['Content-Encoding'] = stored.encoding
+        elif response is None:
+            response = HttpResponse(gzip.decompress(stored.data), content_type='text/plain; charset=utf-8')
+
+        # 304 несет те же заголовки кэширования, что и полный ответ
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = content_cache_control(book)
+        return response
+
+
+# --- Глава с навигацией для режима чтения ---
+class ChapterReaderView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, book_id, chapter_id):
+        try:
+            chapter = Chapter.objects.with_order_lookup() \
+                                     .select_related('book__author') \
+                                     .prefetch_related('images') \
+                                     .get(id=chapter_id, book_id=book_id, is_deleted=False)
+        except Chapter.DoesNotExist:
+            raise NotFound('Chapter not found')
+
+        is_owner = request.user.is_authenticated and chapter.book.author_id == request.user.id
+        if chapter.book.is_deleted or not (chapter.book.is_visible or is_owner):
+            raise NotFound('Chapter not found')
+
+        siblings = Chapter.objects.filter(book_id=book_id, is_deleted=False).values('id', 'title')
+        prev_chapter = siblings.filter(position__lt=chapter.position).order_by('-position').first()
+        next_chapter = siblings.filter(position__gt=chapter.position).order_by('position').first()
+
+        if prev_chapter:
+            prev_chapter['order'] = chapter.order - 1
+        if next_chapter:
+            next_chapter['order'] = chapter.order + 1
+
+        if next_chapter and request.query_params.get('include_next') in ('1', 'true'):
+            next_chapter['images'] = list(
+                ChapterImage.objects.filter(chapter_id=next_chapter['id'], is_pending=False)
+                                    .order_by('order')
+                                    .values_list('image', flat=True)
+            )
+
+        return Response({
+            'book': ReaderBookSerializer(chapter.book).data,
+            'chapter': ChapterDetailSerializer(chapter).data,
+            'prev': prev_chapter,
+            'next': next_chapter,
+            'is_owner': is_owner,
+        })
+
+
+# --- Пакетное получение глав ---
+class ChapterBatchView(APIView):
+    permission_classes = [AllowAny]
+    throttle_scope = 'catalog'
+    shed_first = True
+
+    def get(self, request):
+        ids = parse_batch_ids(request)
+        user_id = request.user.id if request.user.is_authenticated else None
+        return json_array_response(self.iter_chapters(ids, user_id))
+
+    def iter_chapters(self, ids, user_id):
+        queryset = Chapter.objects.filter(is_deleted=False).with_order_lookup().select_related('book').prefetch_related('images')
+
+        for chunk in chunked(ids, BATCH_CHUNK_SIZE):
+            chapters = queryset.in_bulk(chunk)
+            for chapter_id in chunk:
+                chapter = chapters.get(chapter_id)
+                is_owner = chapter is not None and chapter.book.author_id == user_id
+
+                if chapter is None or chapter.book.is_deleted or not (chapter.book.is_visible or is_owner):
+                    yield {'id': chapter_id, 'error': 'not_found'}
+                    continue
+
+                data = ChapterDetailSerializer(chapter).data
+                data['book_id'] = chapter.book_id
+                data['is_owner'] = is_owner
+                yield data
+
+
 # --- Редактирование главы ---
 class ChapterUpdateView(generics.UpdateAPIView):
     permission_classes = [IsAuthenticated, IsWriter]
     serializer_class = ChapterUpdateSerializer
 
     def get_queryset(self):
-        return Chapter.objects.filter(book__id=self.kwargs['book_id'])
+        return Chapter.objects.filter(book__id=self.kwargs['book_id'], is_deleted=False)
 
     def get_object(self):
         try:
@@ -331,13 +661,35 @@ class ChapterUpdateView(generics.UpdateAPIView):
         return context
 
 
+# --- Перемещение главы ---
+class ChapterMoveView(APIView):
+    permission_classes = [IsAuthenticated, IsWriter]
+
+    def post(self, request, book_id, chapter_id):
+        try:
+            chapter = Chapter.objects.select_related('book').get(id=chapter_id, book_id=book_id, is_deleted=False)
+        except Chapter.DoesNotExist:
+            raise NotFound("Глава не найдена")
+
+        if chapter.book.author != request.user:
+            raise PermissionDenied("Вы не можете изменять порядок глав в этой книге.")
+
+        serializer = ChapterMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        move_chapter(chapter, serializer.validated_data['order'])
+        chapter = Chapter.objects.with_order_lookup().get(pk=chapter.pk)
+
+        return Response({'id': chapter.id, 'order': chapter.order})
+
+
 # --- Удаление главы ---
 class ChapterDeleteView(generics.DestroyAPIView):
     permission_classes = [IsAuthenticated, IsWriter]
     serializer_class = ChapterDetailSerializer
 
     def get_queryset(self):
-        return Chapter.objects.filter(book__id=self.kwargs['book_id'])
+        return Chapter.objects.filter(book__id=self.kwargs['book_id'], is_deleted=False)
 
     def get_object(self):
         try:
@@ -347,6 +699,13 @@ class ChapterDeleteView(generics.DestroyAPIView):
             return chapter
         except Chapter.DoesNotExist:
             raise NotFound("Глава не найдена")
+
+    def destroy(self, request, *args, **kwargs):
+        job = self.perform_destroy(self.get_object())
+        return Response({'job_id': job.id}, status=status.HTTP_202_ACCEPTED)
+
+    def perform_destroy(self, instance):
+        return schedule_chapter_purge(instance, user=self.request.user)
  
 
 # --- Создание комментария ---
@@ -362,12 +721,53 @@ class CreateCommentView(generics.CreateAPIView):
         serializer.save(user=self.request.user, book_id=book_id)
 
 
+# --- Архив книги для чтения без сети (поддерживает докачку через Range) ---
+class BookBundleView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, id):
+        book = Book.objects.filter(pk=id, is_deleted=False).only('id', 'author_id', 'is_visible', 'bundle').first()
+        is_owner = book is not None and request.user.is_authenticated and book.author_id == request.user.id
+        if book is None or not (book.is_visible or is_owner):
+            raise NotFound('Книга не найдена')
+
+        path = static_path(book.bundle) if book.bundle else None
+        if path is None or not os.path.exists(path):
+            job = schedule_bundle(book.id, delay=None)
+            return Response({'detail': 'Архив готовится', 'job_id': job.id}, status=status.HTTP_202_ACCEPTED)
+
+        version = os.path.basename(path)[len('bundle-'):-len('.zip')]
+        return bundles.ranged_file_response(request, path, version, 'application/zip', f'book-{book.id}-{version}.zip',
+                                            cache_control=content_cache_control(book))
+
+
+# --- События книги: новые комментарии, главы и рейтинг (Server-Sent Events, нужен ASGI) ---
+@require_GET
+async def book_events(request, id):
+    if not await Book.objects.filter(id=id, is_visible=True, is_deleted=False).aexists():
+        return JsonResponse({'error': 'Book not found'}, status=404)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    response = StreamingHttpResponse(events.event_stream(id, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # --- Комментарии к книге ---
 class BookCommentsListView(APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        return Comment.objects.filter(book_id=self.kwargs['id']).select_related('user').order_by('-created_at')
+
     def get(self, request, id):
-        all_comments = Comment.objects.filter(book_id=id).order_by('-created_at')
+        all_comments = self.get_queryset()
         current_user_comment = None
 
         if request.user.is_authenticated:
@@ -378,10 +778,28 @@ class BookCommentsListView(APIView):
             except Comment.DoesNotExist:
                 pass
 
+        if wants_stream(request):
+            return json_object_response({
+                "user_comment": current_user_comment,
+                "other_comments": serialize_stream(all_comments, CommentSerializer)
+            })
+
         other_comments_serialized = CommentSerializer(all_comments, many=True).data
 
         return Response({
             "user_comment": current_user_comment,
             "other_comments": other_comments_serialized
         })
-    
\ No newline at end of file
+    
+
+
+# --- Статус фоновой задачи ---
+class JobDetailView(generics.RetrieveAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = JobSerializer
+    lookup_field = 'id'
+
+    def get_queryset(self):
+        if self.request.user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(user=self.request.user)
@@ -0,0 +1,68 @@
+import gc
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.db import connections
+from django.urls import get_resolver
+from django.utils import translation
+from django.utils.module_loading import import_string
+
+from . import autocomplete
+from .compiled import CompiledModelSerializer
+
+
+DEFAULTS = {
+    # Сериализаторы горячих маршрутов: поля (или план полей) строятся заранее, вместе с кэшами _meta моделей
+    'SERIALIZERS': [
+        'app.serializers.BookCardSerializer',
+        'app.serializers.BookDetailSerializer',
+        'app.serializers.ChapterDetailSerializer',
+        'app.serializers.CommentSerializer',
+        'app.serializers.WriterSerializer',
+        'app.serializers.GenreSerializer',
+    ],
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'WARMUP', {})}
+
+
+# --- Разогрев процесса перед fork ---
+# Все, что Django и DRF иначе делают лениво на первых запросах каждого воркера:
+# импорт представлений и компиляция маршрутов, загрузка классов из настроек DRF,
+# построение полей сериализаторов, каталоги переводов, индекс автодополнения.
+# Соединение с базой, открытое для индекса, закрывается до fork — соединения
+# и пулы потоков воркеры создают сами.
+def warm_up(freeze=False):
+    # Заполнение обратного словаря импортирует представления и компилирует шаблоны маршрутов
+    get_resolver().reverse_dict
+
+    from rest_framework.settings import api_settings
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+    for name in api_settings.import_strings:
+        getattr(api_settings, name)
+    for name in jwt_settings.import_strings:
+        getattr(jwt_settings, name)
+
+    for path in get_config()['SERIALIZERS']:
+        serializer_class = import_string(path)
+        if issubclass(serializer_class, CompiledModelSerializer):
+            serializer_class.get_plan()
+        else:
+            serializer_class().fields
+
+    autocomplete.get_index()
+
+    get_hashers()
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.deactivate()
+
+    # Делить соединение между процессами нельзя
+    connections.close_all()
+
+    if freeze:
+        # Прогретые объекты уходят из-под сборщика мусора, и его обходы в воркерах
+        # не копируют общие страницы памяти
+        gc.collect()
+        gc.freeze()
@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nonfiction_server.settings')
 
 application = get_asgi_application()
+
+# Under a preloading server (e.g. `gunicorn --preload`) warm the process up
+# before it forks, so workers start ready and share the warmed memory.
+if os.environ.get('DJANGO_PRELOAD'):
+    from app.warmup import warm_up
+
+    warm_up(freeze=True)
@@ -56,14 +56,71 @@ SIMPLE_JWT = {
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'app.metrics.TimedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'app.throttling.SlidingWindowThrottle',
+    ),
+    # Number of reverse proxies in front of the app. Anonymous clients are throttled
+    # by the address the last trusted proxy saw; with 0 X-Forwarded-For is ignored
+    # and REMOTE_ADDR is used, so clients cannot pick their own identity.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+# Caches. Throttling counters must be shared by all worker processes and need an
+# atomic incr, so they live in Redis; the default cache stays per process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttling': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('THROTTLING_REDIS_URL', 'redis://localhost:6379/1'),
+        # An unreachable Redis must fail fast: throttling then falls back to per-process counters
+        'OPTIONS': {'socket_connect_timeout': 0.1, 'socket_timeout': 0.1},
+    },
+}
+
+# Sliding-window throttling per client (user id, or IP for anonymous requests).
+# Views pick a scope with `throttle_scope`; limits are (requests per second,
+# requests per window), the window being their ratio in seconds. Counters are
+# atomic in the CACHE alias. When that cache fails, each process counts requests
+# in memory for FALLBACK_SECONDS before trying it again.
+
+THROTTLING = {
+    'ENABLED': True,
+    'CACHE': 'throttling',
+    'FALLBACK_SECONDS': 30,
+    'SCOPES': {
+        'default': {'anon': (5, 60), 'user': (10, 120)},
+        'catalog': {'anon': (2, 30), 'user': (5, 60)},
+        'search': {'anon': (10, 50), 'user': (20, 100)},
+        'auth': {'anon': (0.2, 10), 'user': (0.2, 10)},
+    },
+}
+
+# Per-process load shedding: past EXPENSIVE_AT requests in flight (or MAX_QUEUE_MS
+# spent in the proxy queue, from X-Request-Start) views marked `shed_first` get 503,
+# past ALL_AT every route except EXEMPT_ROUTES does.
+
+LOAD_SHEDDING = {
+    'ENABLED': True,
+    'EXPENSIVE_AT': 8,
+    'ALL_AT': 32,
+    'MAX_QUEUE_MS': 2000,
+    'RETRY_AFTER': 2,
+    'EXEMPT_ROUTES': ['metrics', 'api/login/', 'api/token/refresh/'],
 }
 
 MIDDLEWARE = [
+    'app.profiling.SamplingProfilerMiddleware',
+    'app.metrics.MetricsMiddleware',
+    'app.throttling.LoadShedMiddleware',
+    'app.slowqueries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -74,6 +131,32 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Opt-in request profiling (`manage.py profile_report` aggregates the dumps).
+# Requests are profiled at SAMPLE_RATE, or when they carry a signed HEADER
+# issued by `manage.py profile_report --token`.
+
+PROFILING = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 0.0,
+    'DIR': os.path.join(BASE_DIR, 'profiles'),
+    'HEADER': 'X-Debug-Profile',
+}
+
+# Directory shared by all worker processes for /metrics aggregation.
+# When unset, /metrics reports only the process that serves the request.
+
+METRICS_DIR = None
+
+# Slow query log with EXPLAIN capture (`manage.py slow_query_report` ranks fingerprints).
+
+SLOW_QUERY_LOG = {
+    'ENABLED': False,
+    'THRESHOLD_MS': 200,
+    'PATH': os.path.join(BASE_DIR, 'logs', 'slow_queries.jsonl'),
+    'EXPLAIN': True,
+    'ANALYZE': False,
+}
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:4200",
 ]
@@ -135,6 +218,29 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = 'app.User'
 
+# Password hashing runs in a bounded per-process thread pool so login and
+# registration bursts cannot starve the threads serving reads; when WORKERS
+# and QUEUE_SIZE are exhausted, auth endpoints answer 429 with Retry-After.
+# Changing ITERATIONS is safe: stored hashes are upgraded on the next login.
+
+PASSWORD_HASHERS = [
+    # Same pbkdf2_sha256 algorithm as Django's hasher, which must not be listed
+    # as well: hashers are looked up by algorithm and the later entry wins.
+    'app.hashing.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+AUTH_HASHING = {
+    'WORKERS': 2,
+    'QUEUE_SIZE': 16,
+    'QUEUE_TIMEOUT': 5,
+    'ITERATIONS': None,
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -153,6 +259,53 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# Autocomplete index snapshot (written by `manage.py autocomplete_snapshot`).
+# When unset or missing, the index is built from the database at warm-up or on first use.
+
+AUTOCOMPLETE_SNAPSHOT = None
+
+# Each worker rebuilds its autocomplete index from the database this often (seconds)
+# to pick up writes handled by other workers; 0 disables the refresh.
+
+AUTOCOMPLETE_REFRESH_INTERVAL = 300
+
+# Background jobs (`manage.py run_workers`).
+# Uploads are moved here first and then processed by a worker.
+
+UPLOAD_STAGING_DIR = os.path.join(BASE_DIR, 'uploads', 'staging')
+
+# Run jobs right after the transaction commits instead of in workers (local development).
+
+JOBS_RUN_INLINE = False
+
+# Live book events (`/api/books/<id>/events/`, Server-Sent Events; needs an ASGI server).
+# The in-process broker only reaches subscribers of the same process: with several
+# workers set BROKER to a class with the same interface backed by shared storage.
+
+BOOK_EVENTS = {
+    'BROKER': 'app.events.InProcessBroker',
+    'HISTORY_SIZE': 200,
+    'HEARTBEAT': 15,
+    'RETRY_MS': 3000,
+    'QUEUE_SIZE': 100,
+}
+
+# Boot warm-up, run by wsgi.py/asgi.py when the DJANGO_PRELOAD environment variable
+# is set: URL patterns, DRF settings and the fields of SERIALIZERS are built once in
+# the master process before workers fork. `manage.py import_profile` shows where
+# the boot time goes.
+
+WARMUP = {
+    'SERIALIZERS': [
+        'app.serializers.BookCardSerializer',
+        'app.serializers.BookDetailSerializer',
+        'app.serializers.ChapterDetailSerializer',
+        'app.serializers.CommentSerializer',
+        'app.serializers.WriterSerializer',
+        'app.serializers.GenreSerializer',
+    ],
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
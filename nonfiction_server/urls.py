@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from app.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('app.urls'))
+    path('api/', include('app.urls')),
+    path('metrics', metrics_view),
 ]